@@ -20,14 +20,14 @@ from models.conversation import (
 from models.user import UserResponse
 from models.business import AnalyticsResponse
 from services.conversation import ConversationService
-from services.memory_service import MemoryService
+from services.memory_service import get_memory_service
 from services.evolution_service import get_evolution_service
 
 router = APIRouter()
 
 # Initialize services
 conversation_service = ConversationService()
-memory_service = MemoryService()
+memory_service = get_memory_service()
 
 # Simple in-memory cache for contacts (refreshes every 5 minutes)
 _contacts_cache: Dict[str, Any] = {
@@ -483,48 +483,33 @@ async def get_analytics(days: int = Query(7, le=30)):
     since = datetime.utcnow() - timedelta(days=days)
     today = datetime.utcnow().replace(hour=0, minute=0, second=0, microsecond=0)
     
-    # Get Evolution API stats
     evolution_service = get_evolution_service()
-    platform_stats = await evolution_service.get_platform_stats()
-    
-    # Conversation stats from MongoDB
-    total_conversations = await memory_service.conversations.count_documents({
-        "created_at": {"$gte": since}
-    })
-    
-    active_conversations = await memory_service.conversations.count_documents({
-        "status": "active"
-    })
-    
-    resolved_conversations = await memory_service.conversations.count_documents({
-        "created_at": {"$gte": since},
-        "resolved": True
-    })
-    
-    escalated_conversations = await memory_service.conversations.count_documents({
-        "created_at": {"$gte": since},
-        "escalated": True
-    })
-    
-    # User stats
-    total_users = await memory_service.users.count_documents({})
-    
-    active_users_today = await memory_service.users.count_documents({
-        "last_contact": {"$gte": today}
-    })
-    
-    new_users_today = await memory_service.users.count_documents({
-        "created_at": {"$gte": today}
-    })
-    
-    # Message stats - combine MongoDB and Evolution API
-    mongodb_messages = await memory_service.messages.count_documents({
-        "timestamp": {"$gte": since}
-    })
-    
-    messages_today = await memory_service.messages.count_documents({
-        "timestamp": {"$gte": today}
-    })
+
+    # The Evolution API call and the Mongo counts are independent -
+    # issue all of them concurrently instead of ten serial round-trips
+    (
+        platform_stats,
+        total_conversations,
+        active_conversations,
+        resolved_conversations,
+        escalated_conversations,
+        total_users,
+        active_users_today,
+        new_users_today,
+        mongodb_messages,
+        messages_today,
+    ) = await asyncio.gather(
+        evolution_service.get_platform_stats(),
+        memory_service.conversations.count_documents({"created_at": {"$gte": since}}),
+        memory_service.conversations.count_documents({"status": "active"}),
+        memory_service.conversations.count_documents({"created_at": {"$gte": since}, "resolved": True}),
+        memory_service.conversations.count_documents({"created_at": {"$gte": since}, "escalated": True}),
+        memory_service.users.count_documents({}),
+        memory_service.users.count_documents({"last_contact": {"$gte": today}}),
+        memory_service.users.count_documents({"created_at": {"$gte": today}}),
+        memory_service.messages.count_documents({"timestamp": {"$gte": since}}),
+        memory_service.messages.count_documents({"timestamp": {"$gte": today}}),
+    )
     
     # Use Evolution API message count if higher (more accurate for WhatsApp)
     evolution_messages = platform_stats.get("whatsapp", {}).get("total", 0)
@@ -608,19 +593,15 @@ async def get_live_stats():
     """
     today = datetime.utcnow().replace(hour=0, minute=0, second=0, microsecond=0)
     
-    # Get Evolution API live stats
+    # Evolution API stats and the two Mongo counts are independent
     evolution_service = get_evolution_service()
-    evolution_stats = await evolution_service.get_live_stats()
-    
-    # Get active conversations from MongoDB
-    active_conversations = await memory_service.conversations.count_documents({
-        "status": "active"
-    })
-    
-    # Get messages today from MongoDB
-    messages_today = await memory_service.messages.count_documents({
-        "timestamp": {"$gte": today}
-    })
+    evolution_stats, active_conversations, messages_today = await asyncio.gather(
+        # Dashboard polls every few seconds - cap the whole upstream
+        # round-trip (retries included) at a 5s budget
+        evolution_service.get_live_stats(deadline=time.monotonic() + 5.0),
+        memory_service.conversations.count_documents({"status": "active"}),
+        memory_service.messages.count_documents({"timestamp": {"$gte": today}}),
+    )
     
     # Merge stats
     return {
@@ -7,6 +7,7 @@ from connectors.whatsapp import WhatsAppConnector
 from connectors.messenger import MessengerConnector
 from connectors.telegram import TelegramConnector
 from services.conversation import ConversationService
+from services.evolution_service import get_evolution_service
 from services.safety_service import SafetyService
 from services.ws_manager import broadcast_event
 from api.routes import clear_all_whatsapp_cache
@@ -304,6 +305,22 @@ async def evolution_global_webhook(request: Request, background_tasks: Backgroun
             await broadcast_event("call", call_data)
             return {"status": "ok", "event": event}
         
+        # ============================================
+        # Group Events
+        # ============================================
+        
+        # Group metadata changed - drop the cached info/participants so
+        # the next read refetches instead of serving the hour-long TTL
+        if event in ("groups.upsert", "groups.update", "group.update",
+                     "group-participants.update", "group.participants.update"):
+            groups = data if isinstance(data, list) else [data]
+            service = get_evolution_service(instance)
+            for group in groups:
+                group_jid = group.get("id") or group.get("remoteJid")
+                if group_jid:
+                    await service.invalidate_group_cache(group_jid)
+            return {"status": "ok", "event": event}
+        
         # Unknown event - log but don't fail
         logger.debug(f"Unhandled Evolution event: {event}")
         return {"status": "ignored", "event": event}
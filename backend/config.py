@@ -1,4 +1,4 @@
-from functools import lru_cache
+from functools import cached_property, lru_cache
 from typing import Optional
 
 from pydantic_settings import BaseSettings
@@ -28,6 +28,10 @@ class Settings(BaseSettings):
     # ===================
     jwt_secret: str = "change-me-in-production"
     api_key: str = ""
+    cors_origins: list[str] = [
+        "http://localhost:3000",
+        "http://localhost:3002",
+    ]
     
     # ===================
     # Evolution API (WhatsApp)
@@ -112,6 +116,11 @@ class Settings(BaseSettings):
     whatsapp_notify_orders: bool = True
     whatsapp_notify_bookings: bool = True
 
+    @cached_property
+    def mongodb_display(self) -> str:
+        """MongoDB URI safe for logging (credentials stripped)."""
+        return self.mongodb_uri.split("@")[-1] if "@" in self.mongodb_uri else self.mongodb_uri
+
     class Config:
         env_file = [".env", "env.example"]
         case_sensitive = False
@@ -1,8 +1,10 @@
+import asyncio
 import logging
 from contextlib import asynccontextmanager
 
 from fastapi import FastAPI, WebSocket, WebSocketDisconnect
 from fastapi.middleware.cors import CORSMiddleware
+from fastapi.responses import ORJSONResponse
 
 from api.routes import router as api_router
 from api.webhooks import router as webhook_router
@@ -27,26 +29,56 @@ async def lifespan(app: FastAPI):
     settings = get_settings()
     
     # Log configuration (without secrets)
-    logger.info(f"MongoDB: {settings.mongodb_uri.split('@')[-1] if '@' in settings.mongodb_uri else settings.mongodb_uri}")
+    logger.info(f"MongoDB: {settings.mongodb_display}")
     logger.info(f"Redis: {settings.redis_url}")
     logger.info(f"Evolution API: {settings.evolution_api_url}")
     logger.info(f"Groq configured: {bool(settings.groq_api_key)}")
     
     # Initialize indexes
     try:
-        from services.memory_service import MemoryService
-        memory = MemoryService()
-        
-        # Create indexes
-        await memory.users.create_index("phone")
-        await memory.users.create_index("whatsapp_id")
-        await memory.users.create_index("email")
-        await memory.conversations.create_index("user_id")
-        await memory.conversations.create_index("status")
-        await memory.messages.create_index("conversation_id")
-        await memory.messages.create_index("timestamp")
-        
-        logger.info("MongoDB indexes created")
+        from redis.asyncio import Redis
+
+        from services.memory_service import get_memory_service
+        memory = get_memory_service()
+        app.state.memory = memory
+
+        # Only the first replica in a deployment needs to ensure indexes;
+        # the Redis flag lets the rest skip the round-trips. Bump the
+        # version suffix whenever the index set changes.
+        redis = Redis.from_url(settings.redis_url)
+        try:
+            first_replica = await redis.set(
+                "leblebbot:indexes:v1", "1", nx=True, ex=86400
+            )
+        finally:
+            await redis.aclose()
+
+        if first_replica:
+            # Create indexes - one createIndexes command per collection
+            # instead of one round-trip per index
+            from pymongo import IndexModel
+
+            await memory.users.create_indexes([
+                IndexModel("phone", background=True),
+                IndexModel("whatsapp_id", background=True),
+                IndexModel("email", background=True),
+            ])
+            await memory.conversations.create_indexes([
+                IndexModel("user_id", background=True),
+                IndexModel("status", background=True),
+            ])
+            await memory.messages.create_indexes([
+                # Compound index serves the hot recent-messages query
+                # (filter on conversation_id, newest-first sort) entirely
+                # from the index; its prefix also covers plain
+                # conversation_id lookups
+                IndexModel([("conversation_id", 1), ("timestamp", -1)], background=True),
+                IndexModel("timestamp", background=True),
+            ])
+
+            logger.info("MongoDB indexes created")
+        else:
+            logger.info("MongoDB indexes already ensured by another replica")
     except Exception as e:
         logger.warning(f"Could not create indexes: {e}")
     
@@ -57,6 +89,37 @@ async def lifespan(app: FastAPI):
     # Shutdown
     logger.info("Shutting down LeblebBot API...")
     
+    # Flush fire-and-forget Mongo writes before connections go away
+    try:
+        from services.conversation import drain_background_writes
+        await drain_background_writes()
+    except Exception as e:
+        logger.warning(f"Error draining background writes: {e}")
+
+    # Same for the AI engine's background cache writes
+    try:
+        from services import ai_engine
+        await ai_engine.drain_background_writes()
+    except Exception as e:
+        logger.warning(f"Error draining AI cache writes: {e}")
+
+    # Write out any sheet rows still buffered by the batcher
+    try:
+        from services.google_sheets import sheets_service
+        await sheets_service.flush()
+    except Exception as e:
+        logger.warning(f"Error flushing sheet rows: {e}")
+
+    # Flush any messages still in the write-behind buffer
+    try:
+        from services import memory_service as memory_module
+        if memory_module._memory_service is not None:
+            await memory_module._memory_service.flush_messages()
+            await memory_module._memory_service.flush_last_contact()
+            await memory_module._memory_service.flush_user_facts()
+    except Exception as e:
+        logger.warning(f"Error flushing buffered messages: {e}")
+
     # Close Evolution API HTTP session
     try:
         from services.evolution_client import EvolutionClient
@@ -65,12 +128,13 @@ async def lifespan(app: FastAPI):
     except Exception as e:
         logger.warning(f"Error closing Evolution API session: {e}")
     
-    # Close WebSocket connections
-    for connection in manager.active_connections.copy():
-        try:
-            await connection.close()
-        except:
-            pass
+    # Close WebSocket connections in parallel; a snapshot list avoids
+    # copying the whole set just to iterate
+    await asyncio.gather(
+        *(connection.close() for connection in list(manager.active_connections.values())),
+        return_exceptions=True,
+    )
+    manager.active_connections.clear()
     
     logger.info("LeblebBot API shutdown complete")
 
@@ -80,16 +144,19 @@ app = FastAPI(
     title="LeblebBot API",
     description="AI-powered customer support chatbot API",
     version="1.0.0",
-    lifespan=lifespan
+    lifespan=lifespan,
+    default_response_class=ORJSONResponse
 )
 
-# CORS middleware
+# CORS middleware - explicit origins/methods let the middleware
+# short-circuit, and max_age caches preflights client-side for 24h
 app.add_middleware(
     CORSMiddleware,
-    allow_origins=["*"],  # Configure properly in production
+    allow_origins=get_settings().cors_origins,
     allow_credentials=True,
-    allow_methods=["*"],
+    allow_methods=["GET", "POST", "PUT", "DELETE"],
     allow_headers=["*"],
+    max_age=86400,
 )
 
 # Include routers
@@ -158,7 +225,7 @@ async def user_websocket(websocket: WebSocket, user_id: str):
     """
     User-specific WebSocket for dashboard updates.
     """
-    await manager.connect(websocket)
+    await manager.connect(websocket, user_id=user_id)
     
     try:
         await websocket.send_json({
@@ -1,7 +1,9 @@
 from datetime import datetime
 from typing import Any, Optional
 
-from pydantic import BaseModel, Field
+from pydantic import BaseModel, ConfigDict, Field
+
+_NOW = datetime.utcnow
 
 
 class BotSettings(BaseModel):
@@ -55,33 +57,33 @@ class Business(BusinessBase):
     created_at: datetime
     updated_at: datetime
     
-    # Settings
-    bot_settings: BotSettings = BotSettings()
-    business_hours: BusinessHours = BusinessHours()
-    
+    # Settings - default_factory lets Pydantic skip re-validating the
+    # default on every construction and avoids shared mutable defaults
+    bot_settings: BotSettings = Field(default_factory=BotSettings)
+    business_hours: BusinessHours = Field(default_factory=BusinessHours)
+
     # Connectors
-    connectors: list[ConnectorConfig] = []
-    
+    connectors: list[ConnectorConfig] = Field(default_factory=list)
+
     # Subscription
     plan: str = "free"  # free, starter, pro, enterprise
     plan_expires_at: Optional[datetime] = None
-    
+
     # Stats
     total_conversations: int = 0
     total_messages: int = 0
     total_users: int = 0
-    
+
     # Team
-    team_members: list[str] = []  # User IDs
-    
+    team_members: list[str] = Field(default_factory=list)  # User IDs
+
     # Integrations
-    integrations: dict[str, Any] = {}
-    
+    integrations: dict[str, Any] = Field(default_factory=dict)
+
     # Metadata
-    metadata: dict[str, Any] = {}
+    metadata: dict[str, Any] = Field(default_factory=dict)
 
-    class Config:
-        populate_by_name = True
+    model_config = ConfigDict(populate_by_name=True)
 
 
 class BusinessResponse(BaseModel):
@@ -100,7 +102,9 @@ class BusinessResponse(BaseModel):
 
     @classmethod
     def from_db(cls, business: dict) -> "BusinessResponse":
-        return cls(
+        # Mongo docs are already normalized; model_construct skips
+        # per-field validation on hot read paths
+        return cls.model_construct(
             id=business.get("_id", ""),
             name=business.get("name", ""),
             owner_email=business.get("owner_email", ""),
@@ -114,7 +118,7 @@ class BusinessResponse(BaseModel):
             total_conversations=business.get("total_conversations", 0),
             total_messages=business.get("total_messages", 0),
             total_users=business.get("total_users", 0),
-            created_at=business.get("created_at", datetime.utcnow())
+            created_at=business.get("created_at") or _NOW()
         )
 
 
@@ -128,8 +132,7 @@ class KnowledgeItem(BaseModel):
     updated_at: datetime
     metadata: dict[str, Any] = {}
 
-    class Config:
-        populate_by_name = True
+    model_config = ConfigDict(populate_by_name=True)
 
 
 class KnowledgeCreate(BaseModel):
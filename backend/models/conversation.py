@@ -1,7 +1,9 @@
 from datetime import datetime
 from typing import Any, Optional
 
-from pydantic import BaseModel, Field
+from pydantic import BaseModel, ConfigDict, Field
+
+_NOW = datetime.utcnow
 
 
 class MessageBase(BaseModel):
@@ -17,8 +19,7 @@ class Message(MessageBase):
     timestamp: datetime
     metadata: dict[str, Any] = {}
 
-    class Config:
-        populate_by_name = True
+    model_config = ConfigDict(populate_by_name=True)
 
 
 class MessageCreate(MessageBase):
@@ -36,11 +37,13 @@ class MessageResponse(BaseModel):
 
     @classmethod
     def from_db(cls, message: dict) -> "MessageResponse":
-        return cls(
+        # Mongo docs are already normalized; model_construct skips
+        # per-field validation on hot list endpoints
+        return cls.model_construct(
             id=message.get("_id", ""),
             role=message.get("role", "user"),
             content=message.get("content", ""),
-            timestamp=message.get("timestamp", datetime.utcnow()),
+            timestamp=message.get("timestamp") or _NOW(),
             metadata=message.get("metadata", {})
         )
 
@@ -78,8 +81,7 @@ class Conversation(ConversationBase):
     category: Optional[str] = None  # product, shipping, payment, technical, other
     language: str = "ar"  # ar, en
 
-    class Config:
-        populate_by_name = True
+    model_config = ConfigDict(populate_by_name=True)
 
 
 class ConversationResponse(BaseModel):
@@ -105,7 +107,7 @@ class ConversationResponse(BaseModel):
 
     @classmethod
     def from_db(cls, conv: dict) -> "ConversationResponse":
-        return cls(
+        return cls.model_construct(
             id=conv.get("_id", ""),
             user_id=conv.get("user_id", ""),
             channel=conv.get("channel", "whatsapp"),
@@ -114,8 +116,8 @@ class ConversationResponse(BaseModel):
             resolved=conv.get("resolved", False),
             escalated=conv.get("escalated", False),
             sentiment=conv.get("sentiment", "neutral"),
-            created_at=conv.get("created_at", datetime.utcnow()),
-            updated_at=conv.get("updated_at", datetime.utcnow()),
+            created_at=conv.get("created_at") or _NOW(),
+            updated_at=conv.get("updated_at") or _NOW(),
             last_message=conv.get("last_message"),
             user=conv.get("user"),
             intent=conv.get("intent"),
@@ -1,7 +1,9 @@
 from datetime import datetime
 from typing import Any, Optional
 
-from pydantic import BaseModel, Field
+from pydantic import BaseModel, ConfigDict, Field
+
+_NOW = datetime.utcnow
 
 
 class UserBase(BaseModel):
@@ -39,8 +41,7 @@ class User(UserBase):
     preferences: dict[str, Any] = {}
     metadata: dict[str, Any] = {}
 
-    class Config:
-        populate_by_name = True
+    model_config = ConfigDict(populate_by_name=True)
 
 
 class UserResponse(BaseModel):
@@ -58,7 +59,9 @@ class UserResponse(BaseModel):
 
     @classmethod
     def from_db(cls, user: dict) -> "UserResponse":
-        return cls(
+        # Mongo docs are already normalized; model_construct skips
+        # per-field validation on hot list endpoints
+        return cls.model_construct(
             id=user.get("_id", ""),
             phone=user.get("phone"),
             name=user.get("name"),
@@ -67,6 +70,6 @@ class UserResponse(BaseModel):
             total_spent=user.get("total_spent", 0),
             conversation_count=user.get("conversation_count", 0),
             tags=user.get("tags", []),
-            created_at=user.get("created_at", datetime.utcnow()),
-            last_contact=user.get("last_contact", datetime.utcnow())
+            created_at=user.get("created_at") or _NOW(),
+            last_contact=user.get("last_contact") or _NOW()
         )
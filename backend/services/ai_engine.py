@@ -1,17 +1,199 @@
 from __future__ import annotations
 
-import hashlib
-import json
+import asyncio
 import logging
+from functools import lru_cache
 from typing import Any, Optional
+from uuid import uuid4
 
-import redis
-from groq import Groq
+import chromadb
+import orjson
+import xxhash
+import zstandard as zstd
+from groq import AsyncGroq
+from redis.asyncio import BlockingConnectionPool, Redis
 
 from config import get_settings
 
 logger = logging.getLogger(__name__)
 
+# Groq JSON mode: the server guarantees parseable JSON output
+JSON_MODE = {"type": "json_object"}
+
+DIALECT_MAP = {
+    "egyptian": "المصرية",
+    "gulf": "الخليجية",
+    "levantine": "الشامية",
+    "standard": "الفصحى"
+}
+
+
+# Strong references to fire-and-forget cache writes; the event loop
+# only keeps weak refs to tasks, so an unreferenced task can be GC'd
+# mid-flight and the write silently dropped
+_BG_TASKS: set[asyncio.Task] = set()
+
+
+def _spawn(coro) -> asyncio.Task:
+    """Run a cache write in the background, off the response path"""
+    task = asyncio.create_task(coro)
+    _BG_TASKS.add(task)
+    task.add_done_callback(_BG_TASKS.discard)
+    return task
+
+
+async def drain_background_writes() -> None:
+    """Wait for pending background cache writes (shutdown hook)"""
+    if _BG_TASKS:
+        await asyncio.gather(*_BG_TASKS, return_exceptions=True)
+
+
+@lru_cache(maxsize=1024)
+def _build_system_prompt_cached(
+    bot_name: str,
+    personality: str,
+    dialect: str,
+    user_fields: Optional[tuple]
+) -> str:
+    """
+    Static prompt prefix: business identity, rules and the stable user
+    profile. Per-query knowledge/facts live in the dynamic block that
+    follows, so this prefix stays byte-identical across a user's
+    messages and provider-side prompt caching can reuse it.
+    """
+    user_info = ""
+    if user_fields:
+        name, order_count, total_spent = user_fields
+        user_info = f"""
+معلومات العميل:
+- الاسم: {name or 'غير معروف'}
+- عدد الطلبات: {order_count}
+- إجمالي المشتريات: {total_spent} جنيه
+"""
+
+    return f"""أنت {bot_name} - مساعد خدمة عملاء ذكي.
+
+الشخصية: {personality}
+اللهجة: {dialect}
+
+قواعد مهمة:
+1. ردودك قصيرة ومفيدة (جملة أو جملتين)
+2. لا تكرر نفسك
+3. لا تخترع معلومات - لو مش متأكد قول "خليني أتأكد"
+4. لو العميل زعلان، اعتذر واعرض المساعدة
+5. استخدم إيموجي باعتدال 😊
+6. لو فيه فرصة بيع، اقترح بدون إلحاح
+{user_info}"""
+
+
+@lru_cache(maxsize=2048)
+def _build_dynamic_block(knowledge: "str | tuple", user_facts: tuple) -> str:
+    """Per-query block (retrieved knowledge + recalled facts)"""
+    # A str means the caller supplied a prebuilt knowledge block
+    # (e.g. stored alongside the business); tuples are built here
+    if isinstance(knowledge, str):
+        knowledge_text = knowledge
+    elif knowledge:
+        knowledge_text = "\n\nالمعلومات المتاحة:\n" + "\n".join(
+            f"- {k}" for k in knowledge
+        )
+    else:
+        knowledge_text = ""
+
+    facts_text = ""
+    if user_facts:
+        facts_text = "\n\nمعلومات سابقة عن العميل:\n" + "\n".join(
+            f"- {f}" for f in user_facts
+        )
+
+    return f"{knowledge_text}{facts_text}"
+
+
+class BatchingCoordinator:
+    """
+    Micro-batches concurrent completion requests.
+
+    Prompts arriving within a short window are drained together and
+    dispatched as one parallel burst, amortizing per-request overhead
+    when many users message at once. Each caller awaits its own future.
+    """
+
+    def __init__(
+        self,
+        client: AsyncGroq,
+        batch_size: int = 16,
+        max_wait_ms: float = 20.0
+    ) -> None:
+        self.client = client
+        self.batch_size = batch_size
+        self.max_wait = max_wait_ms / 1000.0
+        self.queue: asyncio.Queue = asyncio.Queue()
+        self._worker_task: Optional[asyncio.Task] = None
+
+    async def submit(
+        self,
+        prompt: str,
+        model: str,
+        temperature: float,
+        max_tokens: int,
+        response_format: Optional[dict] = None
+    ) -> str:
+        future = asyncio.get_running_loop().create_future()
+        self.queue.put_nowait((prompt, model, temperature, max_tokens, response_format, future))
+        if self._worker_task is None or self._worker_task.done():
+            self._worker_task = asyncio.create_task(self._worker())
+        return await future
+
+    async def _worker(self) -> None:
+        loop = asyncio.get_running_loop()
+        while True:
+            batch = [await self.queue.get()]
+            deadline = loop.time() + self.max_wait
+            while len(batch) < self.batch_size:
+                timeout = deadline - loop.time()
+                if timeout <= 0:
+                    break
+                try:
+                    batch.append(await asyncio.wait_for(self.queue.get(), timeout))
+                except asyncio.TimeoutError:
+                    break
+
+            # Dispatch the whole batch in parallel over the async client
+            results = await asyncio.gather(
+                *(
+                    self._call(prompt, model, temperature, max_tokens, response_format)
+                    for prompt, model, temperature, max_tokens, response_format, _ in batch
+                ),
+                return_exceptions=True,
+            )
+            for (*_, future), result in zip(batch, results):
+                if future.cancelled():
+                    continue
+                if isinstance(result, BaseException):
+                    future.set_exception(result)
+                else:
+                    future.set_result(result)
+
+    async def _call(
+        self,
+        prompt: str,
+        model: str,
+        temperature: float,
+        max_tokens: int,
+        response_format: Optional[dict] = None
+    ) -> str:
+        kwargs = {}
+        if response_format:
+            kwargs["response_format"] = response_format
+        response = await self.client.chat.completions.create(
+            model=model,
+            messages=[{"role": "user", "content": prompt}],
+            temperature=temperature,
+            max_tokens=max_tokens,
+            **kwargs
+        )
+        return response.choices[0].message.content
+
 
 class AIEngine:
     """
@@ -22,84 +204,309 @@ class AIEngine:
     FAST_INTENTS = ["greeting", "faq", "simple_question", "price_inquiry", "thanks"]
     SMART_INTENTS = ["negotiation", "complaint", "complex", "sales", "support", "booking"]
 
+    # Max cosine distance for a semantic cache hit
+    SEMANTIC_DISTANCE_THRESHOLD = 0.15
+
+    # Messages of context kept per conversation in the Redis list cache
+    HISTORY_WINDOW = 10
+
+    # Static halves of the classifier prompts - only the message varies,
+    # so joining three parts beats re-rendering the full f-string
+    _INTENT_PROMPT_PREFIX = """صنّف الرسالة التالية إلى واحدة من الفئات:
+- greeting: تحية أو سلام
+- faq: سؤال عام
+- price_inquiry: سؤال عن السعر
+- simple_question: سؤال بسيط
+- thanks: شكر
+- negotiation: تفاوض على السعر
+- complaint: شكوى
+- complex: سؤال معقد
+- sales: نية شراء
+- support: طلب دعم
+- booking: حجز موعد
+- unknown: غير واضح
+
+الرسالة: \""""
+    _INTENT_PROMPT_SUFFIX = """\"
+
+رد بـ JSON فقط بدون أي نص إضافي:
+{"intent": "...", "confidence": 0.0-1.0}"""
+
+    _SENTIMENT_PROMPT_PREFIX = """حلل مشاعر الرسالة التالية:
+\""""
+    _SENTIMENT_PROMPT_SUFFIX = """\"
+
+رد بـ JSON فقط:
+{"sentiment": "positive/negative/neutral", "score": 0.0-1.0, "emotions": ["happy", "angry", "frustrated", "satisfied"]}"""
+
+    _ENTITIES_PROMPT_PREFIX = """استخرج الكيانات من الرسالة:
+\""""
+    _ENTITIES_PROMPT_SUFFIX = """\"
+
+رد بـ JSON:
+{"entities": [{"type": "product/price/date/phone/address", "value": "...", "original": "..."}]}"""
+
+    _SUGGEST_PROMPT_PREFIX = """بناءً على رسالة العميل، اقترح 3 ردود سريعة قصيرة (كل رد أقل من 10 كلمات):
+الرسالة: \""""
+    _SUGGEST_PROMPT_SUFFIX = """\"
+
+رد بـ JSON:
+{"suggestions": ["رد 1", "رد 2", "رد 3"]}"""
+
+    # Keyword fast path: most short messages are decidable without
+    # spending an LLM round-trip on classification
+    HEURISTIC_INTENTS = [
+        ("greeting", ("سلام", "مرحبا", "اهلا", "أهلا", "هاي", "صباح الخير", "مساء الخير")),
+        ("thanks", ("شكرا", "شكراً", "متشكر", "تسلم", "ميرسي")),
+        ("price_inquiry", ("سعر", "السعر", "بكام", "كام", "تمن", "الثمن")),
+    ]
+
     def __init__(self) -> None:
         self.settings = get_settings()
-        self.redis = redis.Redis.from_url(
-            self.settings.redis_url, 
+        # Async client over a bounded pool: cache lookups no longer stall
+        # the event loop, and TCP connections are reused across requests
+        self.pool = BlockingConnectionPool.from_url(
+            self.settings.redis_url,
+            max_connections=50,
             decode_responses=True
         )
+        self.redis = Redis(connection_pool=self.pool)
+        # Binary-mode client for the compressed response cache (the main
+        # pool decodes to str, which would mangle zstd frames)
+        self.redis_bin = Redis.from_url(self.settings.redis_url)
+        # Level 3 keeps compression CPU negligible while cutting Arabic
+        # response payloads to roughly a third of their UTF-8 size
+        self._zstd_c = zstd.ZstdCompressor(level=3)
+        self._zstd_d = zstd.ZstdDecompressor()
+        # In-flight coalescer: identical prompts arriving during a burst
+        # share one Groq call instead of firing duplicates
+        self._inflight: dict[str, asyncio.Future] = {}
         self.groq_client = None
+        self.batcher = None
         if self.settings.groq_api_key:
-            self.groq_client = Groq(api_key=self.settings.groq_api_key)
+            self.groq_client = AsyncGroq(api_key=self.settings.groq_api_key)
+            self.batcher = BatchingCoordinator(self.groq_client)
         
         self.model_fast = self.settings.ai_model_fast
         self.model_smart = self.settings.ai_model_smart
 
+        # Semantic cache (L2): vector lookup over past messages so
+        # reworded questions still hit; the exact MD5 cache stays as L1
+        try:
+            self.chroma_client = chromadb.HttpClient(
+                host=self.settings.chroma_host,
+                port=self.settings.chroma_port
+            )
+            # v2: only non-personalized responses are stored, so a hit
+            # is safe to serve to any user; the rename drops entries
+            # written before that rule existed
+            self.semantic_cache = self.chroma_client.get_or_create_collection(
+                name="ai_response_cache_v2",
+                metadata={"hnsw:space": "cosine"}
+            )
+        except Exception as e:
+            logger.warning(f"Semantic cache unavailable: {e}")
+            self.chroma_client = None
+            self.semantic_cache = None
+
     def _cache_key(self, text: str) -> str:
         """Generate cache key from text hash"""
-        hash_val = hashlib.md5(text.encode()).hexdigest()
-        return f"ai_cache:{hash_val}"
+        # xxh3 is SIMD-accelerated; prompts with history run to kilobytes
+        return f"ai_cache:{xxhash.xxh3_64_hexdigest(text.encode())}"
+
+    @staticmethod
+    def _classifier_cache_key(task: str, message: str) -> str:
+        """Cache key for per-message classifier results"""
+        return f"ai_cls:{task}:{xxhash.xxh3_64_hexdigest(message.encode())}"
+
+    async def _get_classifier_cached(self, task: str, message: str) -> Optional[dict]:
+        """Cached classifier result for this exact message, if any"""
+        try:
+            cached = await self.redis.get(self._classifier_cache_key(task, message))
+            if cached:
+                return orjson.loads(cached)
+        except Exception as e:
+            logger.warning(f"Classifier cache read error: {e}")
+        return None
+
+    async def _set_classifier_cached(
+        self, task: str, message: str, result: dict, ttl: int
+    ) -> None:
+        """Store a classifier result keyed by the message alone"""
+        try:
+            await self.redis.setex(
+                self._classifier_cache_key(task, message),
+                ttl,
+                orjson.dumps(result)
+            )
+        except Exception as e:
+            logger.warning(f"Classifier cache write error: {e}")
 
-    def _get_cached_response(self, prompt: str) -> Optional[str]:
+    async def _get_cached_response(self, prompt: str) -> Optional[str]:
         """Check if response is cached"""
         try:
             cache_key = self._cache_key(prompt)
-            cached = self.redis.get(cache_key)
+            cached = await self.redis_bin.get(cache_key)
             if cached:
                 logger.info("Cache hit for prompt")
-                return cached
+                try:
+                    return self._zstd_d.decompress(cached).decode()
+                except zstd.ZstdError:
+                    # Entry written before compression was introduced
+                    return cached.decode()
         except Exception as e:
             logger.warning(f"Redis cache error: {e}")
         return None
 
-    def _cache_response(self, prompt: str, response: str, ttl: int = 3600) -> None:
-        """Cache response for future use"""
+    async def _cache_response(self, prompt: str, response: str, ttl: int = 3600) -> None:
+        """Cache response for future use (zstd-compressed)"""
         try:
             cache_key = self._cache_key(prompt)
-            self.redis.setex(cache_key, ttl, response)
+            await self.redis_bin.setex(
+                cache_key, ttl, self._zstd_c.compress(response.encode())
+            )
         except Exception as e:
             logger.warning(f"Redis cache set error: {e}")
 
+    async def get_history(self, conversation_id: str) -> Optional[list[dict]]:
+        """
+        Fetch the recent history window for a conversation in a single
+        LRANGE instead of a Mongo round-trip per lookup.
+        Returns None when the cache is cold (caller falls back to Mongo).
+        """
+        try:
+            entries = await self.redis.lrange(
+                f"conv:{conversation_id}", -self.HISTORY_WINDOW, -1
+            )
+        except Exception as e:
+            logger.warning(f"Redis history read error: {e}")
+            return None
+
+        if not entries:
+            return None
+        return [
+            {"role": d["r"], "content": d["c"]}
+            for d in (orjson.loads(e) for e in entries)
+        ]
+
+    async def append_history(self, conversation_id: str, role: str, content: str) -> None:
+        """Append a message to the history cache, capped to the window"""
+        key = f"conv:{conversation_id}"
+        entry = orjson.dumps({"r": role, "c": content})
+        try:
+            async with self.redis.pipeline(transaction=False) as pipe:
+                pipe.rpush(key, entry)
+                pipe.ltrim(key, -self.HISTORY_WINDOW, -1)
+                pipe.expire(key, 86400)
+                await pipe.execute()
+        except Exception as e:
+            logger.warning(f"Redis history write error: {e}")
+
+    async def prime_history(self, conversation_id: str, history: list[dict]) -> None:
+        """Seed the history cache from another source (e.g. Mongo)"""
+        if not history:
+            return
+
+        key = f"conv:{conversation_id}"
+        entries = [
+            orjson.dumps({"r": m["role"], "c": m["content"]})
+            for m in history[-self.HISTORY_WINDOW:]
+        ]
+        try:
+            async with self.redis.pipeline(transaction=False) as pipe:
+                pipe.delete(key)
+                pipe.rpush(key, *entries)
+                pipe.expire(key, 86400)
+                await pipe.execute()
+        except Exception as e:
+            logger.warning(f"Redis history write error: {e}")
+
+    def _semantic_lookup(self, message: str) -> Optional[str]:
+        """Return a cached response for a semantically similar message"""
+        if not self.semantic_cache:
+            return None
+
+        try:
+            results = self.semantic_cache.query(
+                query_texts=[message],
+                n_results=1
+            )
+            if results and results["documents"] and results["documents"][0]:
+                distance = results["distances"][0][0]
+                if distance < self.SEMANTIC_DISTANCE_THRESHOLD:
+                    logger.info(f"Semantic cache hit (distance={distance:.3f})")
+                    return results["metadatas"][0][0]["response"]
+        except Exception as e:
+            logger.warning(f"Semantic cache query error: {e}")
+        return None
+
+    def _semantic_store(self, message: str, response: str) -> None:
+        """Store a message/response pair in the semantic cache"""
+        if not self.semantic_cache:
+            return
+
+        try:
+            self.semantic_cache.add(
+                ids=[uuid4().hex],
+                documents=[message],
+                metadatas=[{"response": response}]
+            )
+        except Exception as e:
+            logger.warning(f"Semantic cache store error: {e}")
+
+    def _classify_heuristic(self, message: str) -> Optional[dict]:
+        """Rule-based intent classification; None when ambiguous"""
+        word_count = len(message.split())
+
+        # Short messages with an obvious keyword
+        if word_count < 6:
+            for intent, keywords in self.HEURISTIC_INTENTS:
+                if any(keyword in message for keyword in keywords):
+                    return {"intent": intent, "confidence": 0.95}
+
+        # Long or multi-question messages need the smart model anyway
+        if word_count > 60 or message.count("؟") + message.count("?") > 1:
+            return {"intent": "complex", "confidence": 0.9}
+
+        return None
+
     async def classify_intent(self, message: str) -> dict:
         """
         Classify message intent for routing decisions.
         Returns intent and confidence score.
         """
+        heuristic = self._classify_heuristic(message)
+        if heuristic:
+            return heuristic
+
         if not self.groq_client:
             return {"intent": "unknown", "confidence": 0.5}
 
-        classification_prompt = f"""صنّف الرسالة التالية إلى واحدة من الفئات:
-- greeting: تحية أو سلام
-- faq: سؤال عام
-- price_inquiry: سؤال عن السعر
-- simple_question: سؤال بسيط
-- thanks: شكر
-- negotiation: تفاوض على السعر
-- complaint: شكوى
-- complex: سؤال معقد
-- sales: نية شراء
-- support: طلب دعم
-- booking: حجز موعد
-- unknown: غير واضح
-
-الرسالة: "{message}"
-
-رد بـ JSON فقط بدون أي نص إضافي:
-{{"intent": "...", "confidence": 0.0-1.0}}"""
+        classification_prompt = "".join(
+            (self._INTENT_PROMPT_PREFIX, message, self._INTENT_PROMPT_SUFFIX)
+        )
 
+        # Intent depends on the message alone, not the surrounding
+        # prompt - cache per message so repeats skip the LLM entirely
+        cached = await self._get_classifier_cached("intent", message)
+        if cached is not None:
+            return cached
+
+        response = await self._generate_raw(
+            classification_prompt,
+            model=self.model_fast,
+            max_tokens=100,
+            response_format=JSON_MODE
+        )
         try:
-            response = await self._generate_raw(
-                classification_prompt, 
-                model=self.model_fast,
-                max_tokens=100
-            )
-            # Parse JSON from response
-            result = json.loads(response.strip())
-            return result
-        except Exception as e:
+            result = orjson.loads(response)
+        except orjson.JSONDecodeError as e:
             logger.error(f"Intent classification error: {e}")
             return {"intent": "unknown", "confidence": 0.5}
 
+        await self._set_classifier_cached("intent", message, result, ttl=86400)
+        return result
+
     def _select_model(self, intent: str, confidence: float) -> str:
         """Select appropriate model based on intent"""
         # Low confidence = use smart model
@@ -118,7 +525,8 @@ class AIEngine:
         self, 
         prompt: str, 
         model: Optional[str] = None,
-        max_tokens: Optional[int] = None
+        max_tokens: Optional[int] = None,
+        response_format: Optional[dict] = None
     ) -> str:
         """Generate raw completion from Groq"""
         if not self.groq_client:
@@ -128,57 +536,175 @@ class AIEngine:
         max_tokens = max_tokens or self.settings.ai_max_tokens
 
         try:
-            response = self.groq_client.chat.completions.create(
+            return await self.batcher.submit(
+                prompt,
                 model=model,
-                messages=[{"role": "user", "content": prompt}],
                 temperature=self.settings.ai_temperature,
-                max_tokens=max_tokens
+                max_tokens=max_tokens,
+                response_format=response_format
             )
-            return response.choices[0].message.content
         except Exception as e:
             logger.error(f"Groq API error: {e}")
             return f"عذراً، حدث خطأ. حاول مرة أخرى."
 
+    async def _generate_raw_stream(
+        self,
+        prompt: str,
+        model: Optional[str] = None,
+        max_tokens: Optional[int] = None
+    ):
+        """Yield completion deltas as they arrive from Groq"""
+        if not self.groq_client:
+            yield f"[AI not configured] {prompt[:100]}"
+            return
+
+        model = model or self.model_fast
+        max_tokens = max_tokens or self.settings.ai_max_tokens
+
+        stream = await self.groq_client.chat.completions.create(
+            model=model,
+            messages=[{"role": "user", "content": prompt}],
+            temperature=self.settings.ai_temperature,
+            max_tokens=max_tokens,
+            stream=True
+        )
+        async for chunk in stream:
+            delta = chunk.choices[0].delta.content
+            if delta:
+                yield delta
+
     async def generate(
-        self, 
-        message: str, 
+        self,
+        message: str,
         context: dict,
-        use_cache: bool = True
+        use_cache: bool = True,
+        stream: bool = False
     ) -> dict:
         """
         Generate AI response with context.
-        Returns response and metadata.
+        Returns response and metadata. With stream=True the result dict
+        carries a "stream" async iterator of text deltas instead of a
+        full "response"; caching happens once the stream is drained.
         """
-        # Build full prompt
+        # Build full prompt: static prefix first, per-query dynamic
+        # block second, so the prefix stays identical across calls
         system_prompt = self._build_system_prompt(context)
+        dynamic_block = self._build_dynamic_context(context)
         conversation_history = self._format_history(context.get("history", []))
-        
-        full_prompt = f"{system_prompt}\n\n{conversation_history}\nالعميل: {message}\nالمساعد:"
 
-        # Check cache
+        full_prompt = f"{system_prompt}{dynamic_block}\n\n{conversation_history}\nالعميل: {message}\nالمساعد:"
+
+        # A response shaped by this user's profile or stored facts must
+        # never enter the semantic cache - it would be served verbatim
+        # to any other user phrasing the question similarly
+        personalized = bool(context.get("user") or context.get("user_facts"))
+
+        # Coalesce duplicate in-flight prompts (streams can't share an
+        # iterator, so they bypass the coalescer)
+        inflight_key = None if stream else self._cache_key(full_prompt)
+        if inflight_key is not None:
+            pending = self._inflight.get(inflight_key)
+            if pending is not None:
+                # Shield: one follower being cancelled must not kill the
+                # shared future the others are awaiting
+                return await asyncio.shield(pending)
+            fut = asyncio.get_running_loop().create_future()
+            self._inflight[inflight_key] = fut
+
+        try:
+            result = await self._generate_with_cache(
+                message, full_prompt, use_cache, stream, personalized
+            )
+            if inflight_key is not None and not fut.done():
+                fut.set_result(result)
+            return result
+        except BaseException as e:
+            if inflight_key is not None and not fut.done():
+                fut.set_exception(e)
+            raise
+        finally:
+            if inflight_key is not None:
+                self._inflight.pop(inflight_key, None)
+
+    async def _generate_with_cache(
+        self,
+        message: str,
+        full_prompt: str,
+        use_cache: bool,
+        stream: bool,
+        personalized: bool
+    ) -> dict:
+        """Cache lookup, routing and generation for a built prompt"""
+        # Start the cache lookup and intent classification together -
+        # they are independent, so the Redis RTT hides behind the
+        # classifier instead of preceding it
+        intent_task = asyncio.create_task(self.classify_intent(message))
+
         if use_cache:
-            cached = self._get_cached_response(full_prompt)
+            cached = await self._get_cached_response(full_prompt)
             if cached:
+                intent_task.cancel()
                 return {
                     "response": cached,
                     "model": "cache",
                     "cached": True
                 }
 
+            # L2: reworded versions of an already-answered question.
+            # Chroma's HTTP client is synchronous - keep the round-trip
+            # off the event loop
+            semantic_hit = await asyncio.to_thread(self._semantic_lookup, message)
+            if semantic_hit:
+                intent_task.cancel()
+                return {
+                    "response": semantic_hit,
+                    "model": "semantic_cache",
+                    "cached": True
+                }
+
         # Classify intent for routing
-        intent_result = await self.classify_intent(message)
+        intent_result = await intent_task
         intent = intent_result.get("intent", "unknown")
         confidence = intent_result.get("confidence", 0.5)
 
         # Select model
         model = self._select_model(intent, confidence)
 
+        if stream:
+            async def response_stream():
+                parts = []
+                async for delta in self._generate_raw_stream(full_prompt, model=model):
+                    parts.append(delta)
+                    yield delta
+
+                # Cache only once the full response is known
+                full_response = "".join(parts)
+                if use_cache and full_response:
+                    _spawn(self._cache_response(full_prompt, full_response))
+                    if not personalized:
+                        _spawn(
+                            asyncio.to_thread(self._semantic_store, message, full_response)
+                        )
+
+            return {
+                "stream": response_stream(),
+                "model": model,
+                "intent": intent,
+                "confidence": confidence,
+                "cached": False
+            }
+
         # Generate response
         response = await self._generate_raw(full_prompt, model=model)
 
-        # Cache response
+        # Cache response in the background; the tiny write shouldn't
+        # delay returning to the user
         if use_cache and response:
-            self._cache_response(full_prompt, response)
+            _spawn(self._cache_response(full_prompt, response))
+            if not personalized:
+                _spawn(
+                    asyncio.to_thread(self._semantic_store, message, response)
+                )
 
         return {
             "response": response,
@@ -189,53 +715,42 @@ class AIEngine:
         }
 
     def _build_system_prompt(self, context: dict) -> str:
-        """Build system prompt with business context"""
+        """Build the static system-prompt prefix with business context"""
         business = context.get("business", {})
         user = context.get("user", {})
-        knowledge = context.get("knowledge", [])
 
         bot_name = business.get("bot_name", self.settings.bot_name)
         personality = business.get("personality", self.settings.bot_personality)
-        
-        dialect_map = {
-            "egyptian": "المصرية",
-            "gulf": "الخليجية",
-            "levantine": "الشامية",
-            "standard": "الفصحى"
-        }
-        dialect = dialect_map.get(
-            business.get("dialect", self.settings.bot_dialect), 
+
+        dialect = DIALECT_MAP.get(
+            business.get("dialect", self.settings.bot_dialect),
             "المصرية"
         )
 
-        knowledge_text = ""
-        if knowledge:
-            knowledge_text = "\n\nالمعلومات المتاحة:\n" + "\n".join(
-                f"- {k}" for k in knowledge[:5]
-            )
+        # The prefix is identical across turns for the same business
+        # and user snapshot - memoize on those
+        return _build_system_prompt_cached(
+            bot_name,
+            personality,
+            dialect,
+            (user.get("name"), user.get("order_count", 0), user.get("total_spent", 0)) if user else None
+        )
 
-        user_info = ""
-        if user:
-            user_info = f"""
-معلومات العميل:
-- الاسم: {user.get('name', 'غير معروف')}
-- عدد الطلبات: {user.get('order_count', 0)}
-- إجمالي المشتريات: {user.get('total_spent', 0)} جنيه
-"""
+    def _build_dynamic_context(self, context: dict) -> str:
+        """Build the per-query block (knowledge + user facts)"""
+        business = context.get("business", {})
+        knowledge = context.get("knowledge", [])
+        user_facts = context.get("user_facts", [])
 
-        return f"""أنت {bot_name} - مساعد خدمة عملاء ذكي.
+        # Businesses with a precomputed knowledge block skip the
+        # per-call slice-and-join entirely
+        kn_block = business.get("kn_block")
 
-الشخصية: {personality}
-اللهجة: {dialect}
+        return _build_dynamic_block(
+            kn_block if kn_block is not None else tuple(knowledge[:5]),
+            tuple(user_facts[:3])
+        )
 
-قواعد مهمة:
-1. ردودك قصيرة ومفيدة (جملة أو جملتين)
-2. لا تكرر نفسك
-3. لا تخترع معلومات - لو مش متأكد قول "خليني أتأكد"
-4. لو العميل زعلان، اعتذر واعرض المساعدة
-5. استخدم إيموجي باعتدال 😊
-6. لو فيه فرصة بيع، اقترح بدون إلحاح
-{user_info}{knowledge_text}"""
 
     def _format_history(self, history: list) -> str:
         """Format conversation history for context"""
@@ -255,49 +770,63 @@ class AIEngine:
         if not self.groq_client:
             return {"sentiment": "neutral", "score": 0.5}
 
-        prompt = f"""حلل مشاعر الرسالة التالية:
-"{message}"
+        cached = await self._get_classifier_cached("sentiment", message)
+        if cached is not None:
+            return cached
 
-رد بـ JSON فقط:
-{{"sentiment": "positive/negative/neutral", "score": 0.0-1.0, "emotions": ["happy", "angry", "frustrated", "satisfied"]}}"""
+        prompt = "".join(
+            (self._SENTIMENT_PROMPT_PREFIX, message, self._SENTIMENT_PROMPT_SUFFIX)
+        )
 
+        response = await self._generate_raw(
+            prompt, model=self.model_fast, max_tokens=100, response_format=JSON_MODE
+        )
         try:
-            response = await self._generate_raw(prompt, model=self.model_fast, max_tokens=100)
-            return json.loads(response.strip())
-        except:
+            result = orjson.loads(response)
+        except orjson.JSONDecodeError:
             return {"sentiment": "neutral", "score": 0.5, "emotions": []}
 
+        # Shorter TTL - sentiment phrasing can shift with campaign context
+        await self._set_classifier_cached("sentiment", message, result, ttl=3600)
+        return result
+
     async def extract_entities(self, message: str) -> dict:
         """Extract entities from message (products, prices, dates, etc.)"""
         if not self.groq_client:
             return {"entities": []}
 
-        prompt = f"""استخرج الكيانات من الرسالة:
-"{message}"
+        cached = await self._get_classifier_cached("entities", message)
+        if cached is not None:
+            return cached
 
-رد بـ JSON:
-{{"entities": [{{"type": "product/price/date/phone/address", "value": "...", "original": "..."}}]}}"""
+        prompt = "".join(
+            (self._ENTITIES_PROMPT_PREFIX, message, self._ENTITIES_PROMPT_SUFFIX)
+        )
 
+        response = await self._generate_raw(
+            prompt, model=self.model_fast, max_tokens=200, response_format=JSON_MODE
+        )
         try:
-            response = await self._generate_raw(prompt, model=self.model_fast, max_tokens=200)
-            return json.loads(response.strip())
-        except:
+            result = orjson.loads(response)
+        except orjson.JSONDecodeError:
             return {"entities": []}
 
+        await self._set_classifier_cached("entities", message, result, ttl=86400)
+        return result
+
     async def suggest_responses(self, message: str, context: dict) -> list:
         """Generate quick response suggestions"""
         if not self.groq_client:
             return []
 
-        prompt = f"""بناءً على رسالة العميل، اقترح 3 ردود سريعة قصيرة (كل رد أقل من 10 كلمات):
-الرسالة: "{message}"
-
-رد بـ JSON:
-{{"suggestions": ["رد 1", "رد 2", "رد 3"]}}"""
+        prompt = "".join(
+            (self._SUGGEST_PROMPT_PREFIX, message, self._SUGGEST_PROMPT_SUFFIX)
+        )
 
+        response = await self._generate_raw(
+            prompt, model=self.model_fast, max_tokens=150, response_format=JSON_MODE
+        )
         try:
-            response = await self._generate_raw(prompt, model=self.model_fast, max_tokens=150)
-            result = json.loads(response.strip())
-            return result.get("suggestions", [])
-        except:
+            return orjson.loads(response).get("suggestions", [])
+        except orjson.JSONDecodeError:
             return ["هشوف ده ليك", "هحولك لمتخصص", "في حاجة تانية أساعدك فيها؟"]
@@ -6,6 +6,10 @@ from datetime import datetime
 from typing import Any, Optional
 from uuid import uuid4
 
+import orjson
+from aiolimiter import AsyncLimiter
+from redis.asyncio import Redis
+
 from config import get_settings
 from connectors.whatsapp import WhatsAppConnector
 from services.safety_service import SafetyService
@@ -17,21 +21,34 @@ class BroadcastService:
     """
     Broadcast service for sending messages to multiple users.
     Includes rate limiting and scheduling.
+
+    Pending work is queued on a Redis stream and state is persisted per
+    broadcast, so queued broadcasts survive restarts and multiple
+    workers can share the stream via a consumer group.
     """
 
+    STREAM_KEY = "bcast:queue"
+    GROUP = "workers"
+
     def __init__(self) -> None:
         self.settings = get_settings()
         self.safety = SafetyService()
         self.whatsapp = WhatsAppConnector()
-        
-        # In-memory queue (use Redis in production)
+
+        self.redis = Redis.from_url(self.settings.redis_url, decode_responses=True)
+        self._worker_task: Optional[asyncio.Task] = None
+
+        # In-memory index; Redis holds the durable copy
         self._queue: list[dict] = []
         self._history: list[dict] = []
+        # O(1) id lookup; the lists only keep processing-order semantics
+        self._by_id: dict[str, dict] = {}
         self._processing = False
         
-        # Rate limiting
-        self._sent_today = 0
-        self._last_reset = datetime.utcnow().date()
+        # Per-send pacing: at most 5 in flight, 10 sends per 20s window
+        # (token bucket replaces the old fixed 2s sleep per message)
+        self._send_sem = asyncio.Semaphore(5)
+        self._rate_limiter = AsyncLimiter(10, 20)
 
     async def create_broadcast(
         self,
@@ -63,7 +80,7 @@ class BroadcastService:
             }
         
         # Check rate limits
-        if self._sent_today >= self.settings.rate_limit_broadcasts_per_day:
+        if await self._sent_today() >= self.settings.rate_limit_broadcasts_per_day:
             return {
                 "success": False,
                 "error": "Daily broadcast limit reached",
@@ -89,10 +106,15 @@ class BroadcastService:
             broadcast["status"] = "scheduled"
         
         self._queue.append(broadcast)
+        self._by_id[broadcast["id"]] = broadcast
+        await self._persist(broadcast)
         
         # Start processing if not scheduled
         if broadcast["status"] == "pending":
-            asyncio.create_task(self._process_broadcast(broadcast["id"]))
+            enqueued = await self._enqueue(broadcast["id"])
+            if not enqueued:
+                # Redis unavailable - degrade to in-process execution
+                asyncio.create_task(self._process_broadcast(broadcast["id"]))
         
         return {
             "success": True,
@@ -101,16 +123,72 @@ class BroadcastService:
             "total_recipients": len(recipients)
         }
 
+    async def _persist(self, broadcast: dict) -> None:
+        """Write broadcast state to its Redis hash"""
+        try:
+            await self.redis.hset(
+                f"bcast:{broadcast['id']}",
+                mapping={
+                    "payload": orjson.dumps(broadcast).decode(),
+                    "status": broadcast["status"],
+                    "sent_count": broadcast["sent_count"],
+                    "failed_count": broadcast["failed_count"],
+                }
+            )
+        except Exception as e:
+            logger.warning(f"Broadcast persist error: {e}")
+
+    async def _enqueue(self, broadcast_id: str) -> bool:
+        """Queue the broadcast id on the Redis stream"""
+        try:
+            await self.redis.xadd(self.STREAM_KEY, {"id": broadcast_id})
+        except Exception as e:
+            logger.warning(f"Broadcast enqueue error: {e}")
+            return False
+
+        if self._worker_task is None or self._worker_task.done():
+            self._worker_task = asyncio.create_task(self._worker())
+        return True
+
+    async def _worker(self) -> None:
+        """Consume queued broadcasts from the stream group"""
+        try:
+            await self.redis.xgroup_create(self.STREAM_KEY, self.GROUP, id="0", mkstream=True)
+        except Exception:
+            pass  # BUSYGROUP - group already exists
+
+        while True:
+            try:
+                entries = await self.redis.xreadgroup(
+                    self.GROUP, "worker-1",
+                    {self.STREAM_KEY: ">"},
+                    count=10, block=1000
+                )
+            except Exception as e:
+                logger.warning(f"Broadcast stream read error: {e}")
+                await asyncio.sleep(1)
+                continue
+
+            for _stream, messages in entries or []:
+                for entry_id, fields in messages:
+                    broadcast_id = fields.get("id")
+                    if broadcast_id:
+                        await self._process_broadcast(broadcast_id)
+                    await self.redis.xack(self.STREAM_KEY, self.GROUP, entry_id)
+
     async def _process_broadcast(self, broadcast_id: str) -> None:
         """Process a broadcast in background"""
-        broadcast = next(
-            (b for b in self._queue if b["id"] == broadcast_id), 
-            None
-        )
-        
-        if not broadcast:
+        broadcast = self._by_id.get(broadcast_id)
+        if broadcast is None:
+            # Queued by a previous process - recover state from Redis
+            broadcast = await self._load(broadcast_id)
+            if broadcast is not None:
+                self._queue.append(broadcast)
+                self._by_id[broadcast_id] = broadcast
+
+        if not broadcast or broadcast["status"] not in ("pending", "scheduled"):
             return
-        
+
         broadcast["status"] = "processing"
         broadcast["started_at"] = datetime.utcnow()
         
@@ -121,46 +199,55 @@ class BroadcastService:
         
         recipients = broadcast["recipients"]
         
+        async def send_one(phone: str) -> dict:
+            async with self._send_sem, self._rate_limiter:
+                return await self.whatsapp.send_message(
+                    to=phone,
+                    message=broadcast["message"],
+                    simulate_typing=True,
+                    vary_message=True
+                )
+
         for i in range(0, len(recipients), batch_size):
             batch = recipients[i:i + batch_size]
-            
-            for phone in batch:
-                try:
-                    # Check daily limit
-                    self._check_daily_reset()
-                    if self._sent_today >= self.settings.rate_limit_broadcasts_per_day:
-                        broadcast["status"] = "rate_limited"
-                        return
-                    
-                    # Send message
-                    result = await self.whatsapp.send_message(
-                        to=phone,
-                        message=broadcast["message"],
-                        simulate_typing=True,
-                        vary_message=True
-                    )
-                    
-                    if result.get("success"):
-                        broadcast["sent_count"] += 1
-                        self._sent_today += 1
-                    else:
-                        broadcast["failed_count"] += 1
-                        broadcast["errors"].append({
-                            "phone": phone,
-                            "error": result.get("error", "Unknown error")
-                        })
-                    
-                    # Small delay between messages
-                    await asyncio.sleep(2)
-                    
-                except Exception as e:
-                    logger.error(f"Broadcast send error: {e}")
+
+            # Check daily limit
+            if await self._sent_today() >= self.settings.rate_limit_broadcasts_per_day:
+                broadcast["status"] = "rate_limited"
+                await self._persist(broadcast)
+                return
+
+            # Fan the batch out; the semaphore + token bucket pace the
+            # sends, so batch wall time tracks the slowest call instead
+            # of summing fixed per-message sleeps
+            results = await asyncio.gather(
+                *(send_one(phone) for phone in batch),
+                return_exceptions=True,
+            )
+
+            batch_sent = 0
+            for phone, result in zip(batch, results):
+                if isinstance(result, BaseException):
+                    logger.error(f"Broadcast send error: {result}")
+                    broadcast["failed_count"] += 1
+                    broadcast["errors"].append({
+                        "phone": phone,
+                        "error": str(result)
+                    })
+                elif result.get("success"):
+                    broadcast["sent_count"] += 1
+                    batch_sent += 1
+                else:
                     broadcast["failed_count"] += 1
                     broadcast["errors"].append({
                         "phone": phone,
-                        "error": str(e)
+                        "error": result.get("error", "Unknown error")
                     })
-            
+
+            if batch_sent:
+                await self._add_sent(batch_sent)
+            await self._persist(broadcast)
+
             # Delay between batches
             if i + batch_size < len(recipients):
                 logger.info(f"Broadcast {broadcast_id}: Batch complete, waiting {batch_delay}s")
@@ -168,6 +255,7 @@ class BroadcastService:
         
         broadcast["status"] = "completed"
         broadcast["completed_at"] = datetime.utcnow()
+        await self._persist(broadcast)
         
         # Move to history
         self._queue.remove(broadcast)
@@ -178,29 +266,43 @@ class BroadcastService:
             f"{broadcast['sent_count']} sent, {broadcast['failed_count']} failed"
         )
 
-    def _check_daily_reset(self) -> None:
-        """Reset daily counter if new day"""
-        today = datetime.utcnow().date()
-        if today > self._last_reset:
-            self._sent_today = 0
-            self._last_reset = today
+    @staticmethod
+    def _daily_key() -> str:
+        return f"bcast:sent:{datetime.utcnow():%Y%m%d}"
+
+    async def _sent_today(self) -> int:
+        """Today's send count, shared across workers"""
+        try:
+            count = await self.redis.get(self._daily_key())
+            return int(count) if count else 0
+        except Exception as e:
+            logger.warning(f"Broadcast counter read error: {e}")
+            return 0
+
+    async def _add_sent(self, count: int) -> None:
+        """Atomically add to today's counter (expires after 36h)"""
+        try:
+            key = self._daily_key()
+            await self.redis.incrby(key, count)
+            await self.redis.expire(key, 129600, nx=True)
+        except Exception as e:
+            logger.warning(f"Broadcast counter write error: {e}")
+
+    async def _load(self, broadcast_id: str) -> Optional[dict]:
+        """Load a broadcast from its Redis hash"""
+        try:
+            payload = await self.redis.hget(f"bcast:{broadcast_id}", "payload")
+        except Exception as e:
+            logger.warning(f"Broadcast load error: {e}")
+            return None
+        return orjson.loads(payload) if payload else None
 
     async def get_broadcast(self, broadcast_id: str) -> Optional[dict]:
         """Get broadcast by ID"""
-        # Check queue
-        broadcast = next(
-            (b for b in self._queue if b["id"] == broadcast_id), 
-            None
-        )
-        
-        if broadcast:
+        broadcast = self._by_id.get(broadcast_id)
+        if broadcast is not None:
             return broadcast
-        
-        # Check history
-        return next(
-            (b for b in self._history if b["id"] == broadcast_id), 
-            None
-        )
+        return await self._load(broadcast_id)
 
     async def list_broadcasts(
         self, 
@@ -208,7 +310,7 @@ class BroadcastService:
         limit: int = 50
     ) -> list[dict]:
         """List broadcasts"""
-        all_broadcasts = self._queue + self._history
+        all_broadcasts = list(self._by_id.values())
         
         if status:
             all_broadcasts = [b for b in all_broadcasts if b["status"] == status]
@@ -220,11 +322,8 @@ class BroadcastService:
 
     async def cancel_broadcast(self, broadcast_id: str) -> dict:
         """Cancel a pending/scheduled broadcast"""
-        broadcast = next(
-            (b for b in self._queue if b["id"] == broadcast_id), 
-            None
-        )
-        
+        broadcast = self._by_id.get(broadcast_id)
+
         if not broadcast:
             return {"success": False, "error": "Broadcast not found"}
         
@@ -233,20 +332,21 @@ class BroadcastService:
         
         broadcast["status"] = "cancelled"
         broadcast["cancelled_at"] = datetime.utcnow()
+        await self._persist(broadcast)
         
         self._queue.remove(broadcast)
         self._history.append(broadcast)
         
         return {"success": True, "message": "Broadcast cancelled"}
 
-    def get_stats(self) -> dict:
+    async def get_stats(self) -> dict:
         """Get broadcast statistics"""
-        self._check_daily_reset()
+        sent_today = await self._sent_today()
         
         return {
-            "sent_today": self._sent_today,
+            "sent_today": sent_today,
             "daily_limit": self.settings.rate_limit_broadcasts_per_day,
-            "remaining_today": max(0, self.settings.rate_limit_broadcasts_per_day - self._sent_today),
+            "remaining_today": max(0, self.settings.rate_limit_broadcasts_per_day - sent_today),
             "queued": len([b for b in self._queue if b["status"] in ["pending", "processing"]]),
             "scheduled": len([b for b in self._queue if b["status"] == "scheduled"]),
             "total_sent": sum(b.get("sent_count", 0) for b in self._history)
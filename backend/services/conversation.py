@@ -1,16 +1,62 @@
 from __future__ import annotations
 
+import asyncio
 import logging
-from datetime import datetime
+import time
+from datetime import datetime, timezone
 from typing import Any, Optional
 
+import ahocorasick
+import xxhash
+
 from services.ai_engine import AIEngine
-from services.memory_service import MemoryService
+from services.memory_service import get_memory_service
 from services.safety_service import SafetyService
 from config import get_settings
 
 logger = logging.getLogger(__name__)
 
+# Strong references to fire-and-forget writes; the event loop only keeps
+# weak refs to tasks, so an unreferenced task can be GC'd mid-flight
+_BG_TASKS: set[asyncio.Task] = set()
+
+
+# Arabic normalization table: alef/teh-marbuta/yeh variants fold to one
+# form, and diacritics (tashkeel) plus tatweel are stripped, so keyword
+# matching survives spelling variation ("إيه"/"ايه", stretched words,
+# vocalized text). str.translate is a single C-level pass.
+_NORM = str.maketrans({
+    "إ": "ا", "أ": "ا", "آ": "ا",
+    "ى": "ي",
+    "ة": "ه",
+    "ـ": None,  # tatweel
+    **{chr(c): None for c in range(0x064B, 0x0653)},  # diacritics
+})
+
+
+def _norm(text: str) -> str:
+    """Fold Arabic letter variants, strip diacritics, lowercase"""
+    return text.translate(_NORM).lower()
+
+
+def _normalize_query(text: str) -> str:
+    """Normalized form with whitespace collapsed (cache keys)"""
+    return " ".join(_norm(text).split())
+
+
+def _spawn(coro) -> asyncio.Task:
+    """Run a write in the background, off the response's critical path"""
+    task = asyncio.create_task(coro)
+    _BG_TASKS.add(task)
+    task.add_done_callback(_BG_TASKS.discard)
+    return task
+
+
+async def drain_background_writes() -> None:
+    """Wait for pending background writes (shutdown hook)"""
+    if _BG_TASKS:
+        await asyncio.gather(*_BG_TASKS, return_exceptions=True)
+
 
 class ConversationService:
     """
@@ -19,15 +65,22 @@ class ConversationService:
     """
 
     # Keywords for human handoff
-    HANDOFF_KEYWORDS = [
+    HANDOFF_KEYWORDS = frozenset({
         "موظف", "مدير", "إنسان", "حقيقي", "مسؤول", "شكوى رسمية",
         "تعويض", "قانوني", "محامي", "بشري"
-    ]
+    })
 
     # Keywords indicating high urgency
-    URGENT_KEYWORDS = [
+    URGENT_KEYWORDS = frozenset({
         "مستعجل", "ضروري", "فوري", "الآن", "حالاً", "طوارئ"
-    ]
+    })
+
+    # Tag marking VIP customers
+    VIP_TAG = "vip"
+
+    # Knowledge-search result cache (normalized-query keyed)
+    KNOWLEDGE_CACHE_TTL = 300  # seconds
+    KNOWLEDGE_CACHE_MAX = 2048
     
     # Intent classification keywords
     INTENT_KEYWORDS = {
@@ -49,8 +102,17 @@ class ConversationService:
     def __init__(self) -> None:
         self.settings = get_settings()
         self.ai_engine = AIEngine()
-        self.memory = MemoryService()
+        self.memory = get_memory_service()
         self.safety = SafetyService()
+        # Settings are immutable for the process lifetime, so the
+        # business context is the same dict on every message
+        self._business = {
+            "bot_name": self.settings.bot_name,
+            "personality": self.settings.bot_personality,
+            "dialect": self.settings.bot_dialect
+        }
+        # key -> (monotonic timestamp, results)
+        self._knowledge_cache: dict[str, tuple[float, list[str]]] = {}
 
     async def process_message(
         self, 
@@ -89,17 +151,25 @@ class ConversationService:
             elif message_type == "image" and media_url:
                 # TODO: Analyze image with Vision
                 message = f"[Image: {media_url}]"
+
+            # Normalize the message exactly once (variant folding +
+            # lowercase); the handoff check and the full scan share it
+            message_lower = _norm(message)
             
-            # Step 4: Save user message (non-blocking)
-            await self.memory.append_message(
+            # Step 4: Save user message (non-blocking); the Mongo write
+            # runs in the background - only the Redis history append is
+            # awaited so context reads see the message in order
+            _spawn(self.memory.append_message(
                 conversation_id=conversation_id,
                 role="user",
                 content=message,
                 metadata={"type": message_type, "media_url": media_url}
-            )
+            ))
+            await self.ai_engine.append_history(conversation_id, "user", message)
             
-            # Step 5: Check for human handoff (fast - keyword matching only)
-            needs_handoff, handoff_reason = self._check_handoff_needed(message, user)
+            # Step 5: Check for human handoff (lazy scan - exits on the
+            # first handoff hit without finishing the pass)
+            needs_handoff, handoff_reason = self._check_handoff_needed(message_lower, user)
             if needs_handoff:
                 return await self._handle_handoff(
                     user=user,
@@ -107,6 +177,10 @@ class ConversationService:
                     message=message,
                     reason=handoff_reason
                 )
+
+            # Full keyword scan, only once handoff is ruled out; every
+            # downstream check reads the shared result
+            counts = _scan_keywords(message_lower)
             
             # Step 6: Build context (fast - uses cached knowledge)
             context = await self._build_context(user, conversation_id, message)
@@ -119,11 +193,11 @@ class ConversationService:
             safe_response = await self.safety.validate_response(response, context)
             
             # Step 9: Fast local classification (no AI call)
-            classification = self._classify_message(message)
-            actions = self._extract_actions_fast(message, classification)
+            classification = self._classify_message(counts)
+            actions = self._extract_actions_fast(counts, classification)
             
-            # Step 10: Save assistant response
-            await self.memory.append_message(
+            # Step 10: Save assistant response (background Mongo write)
+            _spawn(self.memory.append_message(
                 conversation_id=conversation_id,
                 role="assistant",
                 content=safe_response,
@@ -132,19 +206,20 @@ class ConversationService:
                     "intent": ai_result.get("intent"),
                     "cached": ai_result.get("cached", False)
                 }
-            )
-            
+            ))
+            await self.ai_engine.append_history(conversation_id, "assistant", safe_response)
+
             # Step 11: Update conversation (background - non-critical)
-            priority = self._determine_priority(message, {"sentiment": "neutral"}, user)
-            
-            await self.memory.conversations.update_one(
+            priority = self._determine_priority(counts, {"sentiment": "neutral"}, user)
+
+            _spawn(self.memory.conversations.update_one(
                 {"_id": conversation_id},
                 {"$set": {
                     "intent": classification.get("intent"),
                     "category": classification.get("category"),
                     "priority": priority
                 }}
-            )
+            ))
             
             return {
                 "success": True,
@@ -167,63 +242,54 @@ class ConversationService:
                 "needs_handoff": True
             }
 
-    def _check_handoff_needed(self, message: str, user: dict) -> tuple[bool, str]:
-        """Check if message needs human handoff"""
-        message_lower = message.lower()
-        
-        # Check for explicit handoff request
-        for keyword in self.HANDOFF_KEYWORDS:
-            if keyword in message_lower:
-                return True, f"User requested human: '{keyword}'"
-        
-        # Check for VIP user with complaint
-        if user.get("tags") and "vip" in user.get("tags", []):
-            complaint_words = ["مشكلة", "شكوى", "زعلان", "غاضب"]
-            for word in complaint_words:
-                if word in message_lower:
+    def _check_handoff_needed(self, message_lower: str, user: dict) -> tuple[bool, str]:
+        """
+        Check if message needs human handoff.
+        Walks the automaton lazily and returns on the first decisive hit
+        instead of counting every match in the message.
+        """
+        is_vip = self.VIP_TAG in (user.get("tags") or ())
+        for _, word_tags in _KEYWORD_AUTOMATON.iter(message_lower):
+            for _idx, bucket, word in word_tags:
+                # Explicit handoff request
+                if bucket == "handoff":
+                    return True, f"User requested human: '{word}'"
+                # VIP user with complaint
+                if is_vip and bucket == "vip_complaint":
                     return True, "VIP customer with complaint"
-        
+
         return False, ""
     
-    def _classify_message(self, message: str) -> dict:
-        """Classify message intent and category"""
-        message_lower = message.lower()
-        
-        # Detect intent
+    def _classify_message(self, counts: list[int]) -> dict:
+        """Classify message intent and category from the shared keyword scan"""
         detected_intent = "general"
         max_matches = 0
-        
-        for intent, keywords in self.INTENT_KEYWORDS.items():
-            matches = sum(1 for kw in keywords if kw in message_lower)
-            if matches > max_matches:
-                max_matches = matches
+        for intent, idx in _INTENT_INDEX.items():
+            if counts[idx] > max_matches:
+                max_matches = counts[idx]
                 detected_intent = intent
-        
-        # Detect category
-        detected_category = "other"
+
+        detected_category = None
         max_cat_matches = 0
-        
-        for category, keywords in self.CATEGORY_KEYWORDS.items():
-            matches = sum(1 for kw in keywords if kw in message_lower)
-            if matches > max_cat_matches:
-                max_cat_matches = matches
+        for category, idx in _CATEGORY_INDEX.items():
+            if counts[idx] > max_cat_matches:
+                max_cat_matches = counts[idx]
                 detected_category = category
-        
+
         return {
             "intent": detected_intent,
-            "category": detected_category if max_cat_matches > 0 else None
+            "category": detected_category
         }
     
-    def _determine_priority(self, message: str, sentiment: dict, user: dict) -> str:
+    def _determine_priority(self, counts: list[int], sentiment: dict, user: dict) -> str:
         """Determine conversation priority"""
-        message_lower = message.lower()
-        
         # Urgent keywords
-        if any(kw in message_lower for kw in self.URGENT_KEYWORDS):
+        if counts[_IDX_URGENT]:
             return "urgent"
         
         # VIP users get high priority
-        if user.get("tags") and "vip" in user.get("tags", []):
+        tags = user.get("tags") or ()
+        if self.VIP_TAG in tags:
             return "high"
         
         # High value customers get high priority
@@ -235,8 +301,7 @@ class ConversationService:
             return "high"
         
         # Complaints are high priority
-        complaint_keywords = ["شكوى", "مشكلة", "استرجاع", "تالف", "غاضب"]
-        if any(kw in message_lower for kw in complaint_keywords):
+        if counts[_IDX_PRIORITY_COMPLAINT]:
             return "high"
         
         return "medium"
@@ -248,28 +313,33 @@ class ConversationService:
         message: str,
         reason: str
     ) -> dict:
-        """Handle human handoff"""
+        """
+        Handle human handoff.
+        The escalation write and message save run in the background: the
+        user only needs the canned response, and the escalation being
+        durable a few ms after the reply is sent is acceptable here.
+        """
         # Mark conversation as escalated
-        await self.memory.conversations.update_one(
+        _spawn(self.memory.conversations.update_one(
             {"_id": conversation_id},
             {
                 "$set": {
                     "escalated": True,
-                    "escalated_at": datetime.utcnow(),
+                    "escalated_at": datetime.now(timezone.utc),
                     "escalation_reason": reason
                 }
             }
-        )
+        ))
         
         # Save handoff message
         handoff_response = "فهمت، هحولك لأحد زملائي دلوقتي. حد هيتواصل معاك في أقرب وقت 🙏"
         
-        await self.memory.append_message(
+        _spawn(self.memory.append_message(
             conversation_id=conversation_id,
             role="assistant",
             content=handoff_response,
             metadata={"handoff": True, "reason": reason}
-        )
+        ))
         
         # TODO: Send notification to human agents
         
@@ -289,33 +359,43 @@ class ConversationService:
         current_message: str
     ) -> dict:
         """Build context for AI generation"""
-        # Get conversation history
-        history = await self.memory.get_recent_messages(conversation_id, limit=10)
-        
-        # Get relevant knowledge
-        knowledge = await self.memory.search_knowledge(current_message, limit=5)
-        
-        # Get user facts
-        user_facts = await self.memory.recall_user_facts(
-            user["_id"], 
-            current_message, 
-            limit=3
+        user_id = user["_id"]
+
+        # The history, knowledge and user-fact reads hit independent
+        # stores - issue them concurrently instead of serially
+        history, knowledge, user_facts = await asyncio.gather(
+            self.ai_engine.get_history(conversation_id),
+            self._search_knowledge_cached(current_message),
+            self.memory.recall_user_facts(user_id, current_message, limit=3),
+            return_exceptions=True,
         )
+        if isinstance(history, BaseException):
+            logger.warning(f"History read error: {history}")
+            history = None
+        if isinstance(knowledge, BaseException):
+            logger.warning(f"Knowledge search error: {knowledge}")
+            knowledge = []
+        if isinstance(user_facts, BaseException):
+            logger.warning(f"User facts error: {user_facts}")
+            user_facts = []
+
+        # History cache cold: fall back to Mongo and re-prime Redis
+        if history is None:
+            messages = await self.memory.get_recent_messages(conversation_id, limit=10)
+            history = [
+                {"role": m["role"], "content": m["content"]}
+                for m in messages
+            ]
+            await self.ai_engine.prime_history(conversation_id, history)
         
-        # Build business context
-        business = {
-            "bot_name": self.settings.bot_name,
-            "personality": self.settings.bot_personality,
-            "dialect": self.settings.bot_dialect
-        }
-        
+        user_get = user.get
         return {
             "user": {
-                "id": user["_id"],
-                "name": user.get("name"),
-                "order_count": user.get("order_count", 0),
-                "total_spent": user.get("total_spent", 0),
-                "tags": user.get("tags", [])
+                "id": user_id,
+                "name": user_get("name"),
+                "order_count": user_get("order_count", 0),
+                "total_spent": user_get("total_spent", 0),
+                "tags": user_get("tags", [])
             },
             "history": [
                 {"role": m["role"], "content": m["content"]}
@@ -323,28 +403,48 @@ class ConversationService:
             ],
             "knowledge": knowledge,
             "user_facts": user_facts,
-            "business": business
+            "business": self._business
         }
 
-    def _extract_actions_fast(self, message: str, classification: dict) -> list[dict]:
+    async def _search_knowledge_cached(self, message: str) -> list[str]:
+        """
+        Knowledge search with a short-lived in-memory cache keyed by the
+        normalized message, so repeated and re-spelled questions skip
+        the vector-store roundtrip.
+        """
+        key = xxhash.xxh3_64_hexdigest(_normalize_query(message).encode())
+        now = time.monotonic()
+
+        hit = self._knowledge_cache.get(key)
+        if hit and now - hit[0] < self.KNOWLEDGE_CACHE_TTL:
+            return hit[1]
+
+        knowledge = await self.memory.search_knowledge(message, limit=5)
+
+        if len(self._knowledge_cache) >= self.KNOWLEDGE_CACHE_MAX:
+            # Evict the oldest insertion (dicts preserve insert order)
+            self._knowledge_cache.pop(next(iter(self._knowledge_cache)))
+        self._knowledge_cache[key] = (now, knowledge)
+        return knowledge
+
+    def _extract_actions_fast(self, counts: list[int], classification: dict) -> list[dict]:
         """
         Fast action extraction using keyword matching only.
         No AI calls - just pattern matching for speed.
         """
         actions = []
-        message_lower = message.lower()
         intent = classification.get("intent", "general")
         
         # Check for order intent
-        if intent == "sales" or any(kw in message_lower for kw in ["طلب", "اشتري", "اطلب", "عايز", "هاخد"]):
+        if intent == "sales" or counts[_ACTION_INDEX["order"]]:
             actions.append({"type": "potential_order", "confidence": 0.7})
         
         # Check for booking intent
-        if intent == "booking" or any(kw in message_lower for kw in ["حجز", "موعد", "ميعاد", "احجز"]):
+        if intent == "booking" or counts[_ACTION_INDEX["booking"]]:
             actions.append({"type": "potential_booking", "confidence": 0.7})
         
         # Check for complaint
-        if intent == "complaint" or any(kw in message_lower for kw in ["مشكلة", "شكوى", "استرجاع", "استبدال"]):
+        if intent == "complaint" or counts[_ACTION_INDEX["complaint"]]:
             actions.append({"type": "complaint", "confidence": 0.8})
         
         return actions
@@ -356,8 +456,9 @@ class ConversationService:
         context: dict
     ) -> list[dict]:
         """Extract actionable items from conversation (legacy - kept for compatibility)"""
-        classification = self._classify_message(message)
-        return self._extract_actions_fast(message, classification)
+        counts = _scan_keywords(_norm(message))
+        classification = self._classify_message(counts)
+        return self._extract_actions_fast(counts, classification)
 
     async def _extract_and_store_facts(
         self, 
@@ -388,25 +489,95 @@ class ConversationService:
 
     async def get_active_conversations(self, limit: int = 50) -> list[dict]:
         """Get all active conversations with user info"""
-        cursor = self.memory.conversations.find(
-            {"status": "active"}
-        ).sort("updated_at", -1).limit(limit)
-        
-        conversations = await cursor.to_list(length=limit)
-        
-        # Enrich with user info
+        # Single aggregation with $lookup joins instead of one user
+        # query plus one message query per conversation
+        conversations = await self.memory.list_active_with_last_message(limit)
+
         for conv in conversations:
-            user = await self.memory.get_user(conv["user_id"])
+            user = conv.pop("user", None)
             if user:
                 conv["user"] = {
                     "name": user.get("name"),
                     "phone": user.get("phone"),
                     "tags": user.get("tags", [])
                 }
-            
-            # Get last message
-            last_messages = await self.memory.get_recent_messages(conv["_id"], limit=1)
+
+            last_messages = conv.pop("last_message", None)
             if last_messages:
-                conv["last_message"] = last_messages[-1]["content"]
-        
+                conv["last_message"] = last_messages[0]["content"]
+
         return conversations
+
+# One Aho-Corasick automaton over every keyword list the pipeline scans
+# for: a single linear pass over the message replaces ~40 substring
+# scans across handoff, urgency, intent, category and action checks.
+# Each hit carries every (bucket, label) pair the keyword belongs to.
+_ACTION_KEYWORDS = {
+    "order": frozenset({"طلب", "اشتري", "اطلب", "عايز", "هاخد"}),
+    "booking": frozenset({"حجز", "موعد", "ميعاد", "احجز"}),
+    "complaint": frozenset({"مشكلة", "شكوى", "استرجاع", "استبدال"}),
+}
+_VIP_COMPLAINT_WORDS = frozenset({"مشكلة", "شكوى", "زعلان", "غاضب"})
+_PRIORITY_COMPLAINT_WORDS = frozenset({"شكوى", "مشكلة", "استرجاع", "تالف", "غاضب"})
+
+
+def _build_keyword_automaton() -> tuple[ahocorasick.Automaton, dict]:
+    tags: dict[str, list[tuple[str, str]]] = {}
+    label_index: dict[tuple[str, str], int] = {}
+
+    def add(bucket: str, label: str, words) -> None:
+        label_index.setdefault((bucket, label), len(label_index))
+        for word in words:
+            # Normalize keywords the same way messages are normalized,
+            # so matches align; variant spellings collapse to one entry
+            tags.setdefault(_norm(word), []).append((bucket, label))
+
+    add("handoff", "handoff", ConversationService.HANDOFF_KEYWORDS)
+    add("urgent", "urgent", ConversationService.URGENT_KEYWORDS)
+    add("vip_complaint", "vip_complaint", _VIP_COMPLAINT_WORDS)
+    add("priority_complaint", "priority_complaint", _PRIORITY_COMPLAINT_WORDS)
+    for intent, words in ConversationService.INTENT_KEYWORDS.items():
+        add("intent", intent, words)
+    for category, words in ConversationService.CATEGORY_KEYWORDS.items():
+        add("category", category, words)
+    for action, words in _ACTION_KEYWORDS.items():
+        add("action", action, words)
+
+    automaton = ahocorasick.Automaton()
+    for word, word_tags in tags.items():
+        automaton.add_word(
+            word,
+            tuple((label_index[(b, l)], b, word) for b, l in word_tags)
+        )
+    automaton.make_automaton()
+    return automaton, label_index
+
+
+def _scan_keywords(message_lower: str) -> list[int]:
+    """
+    Single automaton pass over a normalized message.
+    Returns a flat counter array indexed by label id - one array store
+    per hit instead of nested dict lookups. Each distinct keyword
+    counts once per label no matter how often it repeats, matching the
+    per-list `kw in message` membership checks this scan replaced.
+    """
+    counts = [0] * _N_LABELS
+    seen: set[tuple[int, str]] = set()
+    for _, word_tags in _KEYWORD_AUTOMATON.iter(message_lower):
+        for idx, _bucket, word in word_tags:
+            key = (idx, word)
+            if key not in seen:
+                seen.add(key)
+                counts[idx] += 1
+    return counts
+
+
+_KEYWORD_AUTOMATON, _LABEL_INDEX = _build_keyword_automaton()
+_N_LABELS = len(_LABEL_INDEX)
+
+# Frequently consulted indices and per-bucket label views
+_IDX_URGENT = _LABEL_INDEX[("urgent", "urgent")]
+_IDX_PRIORITY_COMPLAINT = _LABEL_INDEX[("priority_complaint", "priority_complaint")]
+_INTENT_INDEX = {l: i for (b, l), i in _LABEL_INDEX.items() if b == "intent"}
+_CATEGORY_INDEX = {l: i for (b, l), i in _LABEL_INDEX.items() if b == "category"}
+_ACTION_INDEX = {l: i for (b, l), i in _LABEL_INDEX.items() if b == "action"}
@@ -6,25 +6,93 @@ Base client with connection pooling and retry logic for Evolution API.
 from __future__ import annotations
 
 import asyncio
+import copy
 import logging
+import random
+import time
+import weakref
 from typing import ClassVar, Optional
 
 import aiohttp
+import orjson
 
 from config import get_settings
 
 logger = logging.getLogger(__name__)
 
 
+class CircuitBreaker:
+    """
+    Minimal CLOSED -> OPEN -> HALF_OPEN breaker.
+
+    After `failure_threshold` consecutive failures the breaker opens and
+    calls fail fast for `recovery_timeout` seconds; the first call after
+    the cooldown probes the upstream (half-open) and either closes the
+    breaker again or re-opens it.
+    """
+
+    def __init__(self, failure_threshold: int = 5, recovery_timeout: float = 30.0) -> None:
+        self.failure_threshold = failure_threshold
+        self.recovery_timeout = recovery_timeout
+        self._failures = 0
+        self._opened_at: Optional[float] = None
+        self._probing = False
+
+    def allow(self) -> bool:
+        """Whether a call may proceed right now"""
+        if self._opened_at is None:
+            return True
+        loop_time = asyncio.get_event_loop().time()
+        if loop_time - self._opened_at < self.recovery_timeout:
+            return False
+        # Cooldown elapsed: let one probe through (half-open)
+        if self._probing:
+            return False
+        self._probing = True
+        return True
+
+    def on_success(self) -> None:
+        self._failures = 0
+        self._opened_at = None
+        self._probing = False
+
+    def on_failure(self) -> None:
+        self._failures += 1
+        self._probing = False
+        if self._failures >= self.failure_threshold:
+            if self._opened_at is None:
+                logger.warning("Evolution circuit breaker opened")
+            self._opened_at = asyncio.get_event_loop().time()
+
+
 class EvolutionClient:
     """
     Base HTTP client for Evolution API with connection pooling.
     Uses a singleton session to reuse connections across requests.
     """
     
-    # Class-level session (shared across all instances)
-    _session: ClassVar[Optional[aiohttp.ClientSession]] = None
-    _connector: ClassVar[Optional[aiohttp.TCPConnector]] = None
+    # Class-level sessions (shared across all instances), keyed by event
+    # loop id: a session bound to a recycled loop (uvicorn --reload,
+    # tests) would otherwise hang or raise on first use
+    _sessions: ClassVar[dict[int, aiohttp.ClientSession]] = {}
+
+    # ClientTimeout objects are immutable; reuse them per timeout value
+    # instead of allocating one per call
+    _TIMEOUTS: ClassVar[dict[int, aiohttp.ClientTimeout]] = {}
+
+    # One breaker per (instance, path prefix): a broken media endpoint
+    # must not fail-fast the cheap stats polls
+    _breakers: ClassVar[dict[str, CircuitBreaker]] = {}
+
+    # Single-flight: identical idempotent requests in flight at the same
+    # moment (N dashboard tabs polling) share one upstream call
+    _inflight: ClassVar[dict] = {}
+    _IDEMPOTENT_POSTS = (
+        "/chat/findChats",
+        "/chat/findContacts",
+        "/chat/findMessages",
+        "/chat/fetchProfile",
+    )
     
     def __init__(self, instance_name: Optional[str] = None) -> None:
         self.settings = get_settings()
@@ -38,28 +106,51 @@ class EvolutionClient:
         Get or create the shared aiohttp session with connection pooling.
         This reuses TCP connections for better performance.
         """
-        if cls._session is None or cls._session.closed:
-            cls._connector = aiohttp.TCPConnector(
+        loop = asyncio.get_running_loop()
+        key = id(loop)
+        session = cls._sessions.get(key)
+        if session is None or session.closed:
+            connector = aiohttp.TCPConnector(
                 limit=100,              # Max total connections
                 limit_per_host=30,      # Max connections per host
-                keepalive_timeout=30,   # Keep connections alive for 30s
+                keepalive_timeout=60,   # Keep connections alive for 60s
+                ttl_dns_cache=300,      # Cache DNS lookups for 5 minutes
                 enable_cleanup_closed=True,
                 force_close=False,
             )
-            cls._session = aiohttp.ClientSession(
-                connector=cls._connector,
+            session = aiohttp.ClientSession(
+                connector=connector,
                 timeout=aiohttp.ClientTimeout(total=30, connect=5),
+                headers={
+                    "apikey": get_settings().evolution_api_key,
+                    "Content-Type": "application/json"
+                },
             )
+            cls._sessions[key] = session
+            # Drop the cache entry once the owning loop is collected
+            weakref.finalize(loop, cls._sessions.pop, key, None)
             logger.info("Created new Evolution API HTTP session with connection pooling")
-        return cls._session
+        return session
     
+    @classmethod
+    def _client_timeout(cls, timeout: float) -> aiohttp.ClientTimeout:
+        """Reusable ClientTimeout for the common whole-second values."""
+        # Only cache int timeouts: deadline-clamped values are
+        # near-unique floats, and caching those would grow the table on
+        # every polling request
+        if isinstance(timeout, int):
+            return (
+                cls._TIMEOUTS.get(timeout)
+                or cls._TIMEOUTS.setdefault(timeout, aiohttp.ClientTimeout(total=timeout))
+            )
+        return aiohttp.ClientTimeout(total=timeout)
+
     @classmethod
     async def close_session(cls) -> None:
-        """Close the shared session. Call on application shutdown."""
-        if cls._session and not cls._session.closed:
-            await cls._session.close()
-            cls._session = None
-            cls._connector = None
+        """Close the current loop's shared session. Call on application shutdown."""
+        session = cls._sessions.pop(id(asyncio.get_running_loop()), None)
+        if session and not session.closed:
+            await session.close()
             logger.info("Closed Evolution API HTTP session")
     
     async def _request(
@@ -68,26 +159,84 @@ class EvolutionClient:
         path: str,
         payload: Optional[dict] = None,
         timeout: int = 30,
-        max_retries: int = 2
+        max_retries: int = 3,
+        deadline: Optional[float] = None
     ) -> dict:
         """
         Make HTTP request to Evolution API with connection reuse and retry logic.
-        
+
         Args:
             method: HTTP method (GET, POST, DELETE, etc.)
             path: API path (e.g., "/instance/fetchInstances")
             payload: JSON payload for POST requests
             timeout: Request timeout in seconds
             max_retries: Number of retries for transient errors
-            
+            deadline: Absolute time.monotonic() cutoff; the per-attempt
+                timeout is clamped to whatever budget remains so callers
+                with a 5s UI patience never wait a full 30s default
+
         Returns:
             dict with success, status, data/error keys
         """
-        headers = {
-            "apikey": self.api_key,
-            "Content-Type": "application/json"
-        }
+        if deadline is not None:
+            remaining = deadline - time.monotonic()
+            if remaining <= 0:
+                return {"success": False, "error": "deadline_exceeded"}
+            timeout = min(timeout, remaining)
+
+        # Serialize once up front (orjson); retries reuse the same bytes
+        body = orjson.dumps(payload) if payload is not None else None
+
+        # Coalesce concurrent identical reads: followers await the
+        # leader's result instead of issuing duplicate upstream calls
+        if method == "GET" or (method == "POST" and path.startswith(self._IDEMPOTENT_POSTS)):
+            key = (method, path, body)
+            pending = self._inflight.get(key)
+            if pending is not None:
+                # Every follower gets its own copy: call sites mutate
+                # response payloads in place, and shared structure would
+                # leak one caller's edits into another's result
+                return copy.deepcopy(await asyncio.shield(pending))
+            fut = asyncio.get_running_loop().create_future()
+            self._inflight[key] = fut
+            try:
+                result = await self._request_inner(method, path, body, timeout, max_retries, deadline)
+                if not fut.done():
+                    # Snapshot before handing to followers - the
+                    # leader's caller can mutate `result` before they
+                    # are scheduled to copy it
+                    fut.set_result(copy.deepcopy(result))
+                return result
+            except BaseException as e:
+                if not fut.done():
+                    fut.set_exception(e)
+                raise
+            finally:
+                self._inflight.pop(key, None)
+
+        return await self._request_inner(method, path, body, timeout, max_retries, deadline)
+
+    async def _request_inner(
+        self,
+        method: str,
+        path: str,
+        body: Optional[bytes],
+        timeout: float,
+        max_retries: int,
+        deadline: Optional[float] = None
+    ) -> dict:
+        """Breaker check, retry loop and the actual HTTP round-trip"""
+        # Fail fast while the upstream endpoint group is known-bad
+        prefix = "/".join(path.split("?", 1)[0].split("/")[:3])
+        breaker_key = f"{self.instance_name}:{prefix}"
+        breaker = self._breakers.get(breaker_key)
+        if breaker is None:
+            breaker = self._breakers.setdefault(breaker_key, CircuitBreaker())
+        if not breaker.allow():
+            return {"success": False, "error": "circuit_open"}
+
         url = f"{self.base_url}{path}"
+        request_timeout = self._client_timeout(timeout)
         last_error = None
         
         for attempt in range(max_retries + 1):
@@ -96,11 +245,30 @@ class EvolutionClient:
                 async with session.request(
                     method,
                     url,
-                    json=payload,
-                    headers=headers,
-                    timeout=aiohttp.ClientTimeout(total=timeout)
+                    data=body,
+                    timeout=request_timeout
                 ) as response:
-                    data = await response.json(content_type=None)
+                    # Transient server-side failures are worth retrying;
+                    # other statuses return immediately
+                    if response.status in (429, 500, 502, 503, 504) and attempt < max_retries:
+                        last_error = f"HTTP {response.status}"
+                        logger.warning(
+                            f"Retryable status {response.status} "
+                            f"(attempt {attempt + 1}/{max_retries + 1}): {url}"
+                        )
+                        delay = self._retry_delay(attempt, response.headers.get("Retry-After"))
+                        if deadline is not None and time.monotonic() + delay >= deadline:
+                            last_error = "deadline_exceeded"
+                            break
+                        await asyncio.sleep(delay)
+                        continue
+
+                    raw = await response.read()
+                    data = orjson.loads(raw) if raw else None
+                    if response.status in (429, 500, 502, 503, 504):
+                        breaker.on_failure()
+                    else:
+                        breaker.on_success()
                     return {
                         "success": response.status in (200, 201),
                         "status": response.status,
@@ -111,19 +279,93 @@ class EvolutionClient:
                 last_error = "timeout"
                 logger.warning(f"Request timeout (attempt {attempt + 1}/{max_retries + 1}): {url}")
                 if attempt < max_retries:
-                    await asyncio.sleep(0.5 * (attempt + 1))
+                    delay = self._retry_delay(attempt)
+                    if deadline is not None and time.monotonic() + delay >= deadline:
+                        last_error = "deadline_exceeded"
+                        break
+                    await asyncio.sleep(delay)
                     continue
                     
-            except aiohttp.ClientError as e:
+            except (aiohttp.ClientConnectorError, aiohttp.ServerDisconnectedError) as e:
+                # Connection-level failures are transient - retry
                 last_error = str(e)
-                logger.warning(f"Client error (attempt {attempt + 1}/{max_retries + 1}): {e}")
+                logger.warning(f"Connection error (attempt {attempt + 1}/{max_retries + 1}): {e}")
                 if attempt < max_retries:
-                    await asyncio.sleep(0.5 * (attempt + 1))
+                    delay = self._retry_delay(attempt)
+                    if deadline is not None and time.monotonic() + delay >= deadline:
+                        last_error = "deadline_exceeded"
+                        break
+                    await asyncio.sleep(delay)
                     continue
+
+            except aiohttp.ClientError as e:
+                # Other client errors (bad payload, protocol) won't heal
+                # on retry - fail immediately
+                last_error = str(e)
+                logger.warning(f"Client error: {e}")
+                break
                     
             except Exception as e:
                 last_error = str(e)
                 logger.error(f"Evolution API request error: {e}")
                 break
         
+        breaker.on_failure()
         return {"success": False, "error": last_error}
+
+    async def _request_streaming(
+        self,
+        method: str,
+        path: str,
+        payload: Optional[dict] = None,
+        timeout: int = 60,
+        chunk_size: int = 65536
+    ) -> dict:
+        """
+        Request variant for large envelopes (media base64): the body is
+        accumulated in chunks into one bytearray and parsed once, so the
+        response never sits in memory as both aiohttp's internal buffer
+        chain and a second full bytes copy.
+        """
+        url = f"{self.base_url}{path}"
+        body = orjson.dumps(payload) if payload is not None else None
+        request_timeout = self._client_timeout(timeout)
+        try:
+            session = await self.get_session()
+            async with session.request(
+                method,
+                url,
+                data=body,
+                timeout=request_timeout
+            ) as response:
+                buf = bytearray()
+                async for chunk in response.content.iter_chunked(chunk_size):
+                    buf += chunk
+                data = orjson.loads(bytes(buf)) if buf else None
+                return {
+                    "success": response.status in (200, 201),
+                    "status": response.status,
+                    "data": data
+                }
+        except asyncio.TimeoutError:
+            logger.warning(f"Streaming request timeout: {url}")
+            return {"success": False, "error": "timeout"}
+        except Exception as e:
+            logger.error(f"Streaming request error: {e}")
+            return {"success": False, "error": str(e)}
+
+    @staticmethod
+    def _retry_delay(attempt: int, retry_after: Optional[str] = None) -> float:
+        """
+        Exponential backoff with jitter, honoring Retry-After when the
+        server sends one. Jitter desynchronizes concurrent workers so
+        retries don't arrive in lockstep.
+        """
+        if retry_after:
+            try:
+                return min(2.0, float(retry_after))
+            except ValueError:
+                pass
+        # Full jitter: sleep anywhere in [0, delay] so concurrent
+        # workers spread out instead of retrying in waves
+        return random.uniform(0, min(2.0, 0.2 * (2 ** attempt)))
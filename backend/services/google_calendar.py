@@ -3,24 +3,31 @@ Google Calendar Integration Service for LeblebBot
 Handles booking synchronization with Google Calendar
 """
 
+import asyncio
+from dataclasses import dataclass, field
 from datetime import datetime, timedelta
 from typing import Optional, List, Dict, Any
 import logging
-from pydantic import BaseModel
 
 logger = logging.getLogger(__name__)
 
 
-class CalendarEvent(BaseModel):
-    """Google Calendar Event model"""
-    id: Optional[str] = None
+@dataclass(slots=True)
+class CalendarEvent:
+    """Google Calendar Event model.
+
+    A plain dataclass rather than a Pydantic model: every field arrives
+    already typed from our own call sites, so validation would be pure
+    per-booking overhead, and slots keep instances small.
+    """
     summary: str
-    description: Optional[str] = None
     start_time: datetime
     end_time: datetime
+    id: Optional[str] = None
+    description: Optional[str] = None
     location: Optional[str] = None
-    attendees: List[str] = []
-    reminders: Dict[str, Any] = {}
+    attendees: List[str] = field(default_factory=list)
+    reminders: Dict[str, Any] = field(default_factory=dict)
 
 
 class GoogleCalendarService:
@@ -39,14 +46,27 @@ class GoogleCalendarService:
         self.credentials_path = credentials_path
         self.service = None
         self._initialized = False
+        # Single-flight init: concurrent first calls share one future
+        # instead of racing into initialize() twice
+        self._init_future: Optional[asyncio.Future] = None
         
     async def initialize(self) -> bool:
         """
-        Initialize the Google Calendar API service
+        Initialize the Google Calendar API service. Idempotent and safe
+        under concurrent first calls: the first caller performs the init
+        and followers await the same future.
         
         Returns:
             bool: True if initialization successful
         """
+        if self._initialized:
+            return True
+        pending = self._init_future
+        if pending is not None:
+            return await asyncio.shield(pending)
+
+        fut = asyncio.get_running_loop().create_future()
+        self._init_future = fut
         try:
             # In production, this would use google-auth-oauthlib
             # from google.oauth2.credentials import Credentials
@@ -54,9 +74,13 @@ class GoogleCalendarService:
             
             logger.info("Google Calendar service initialized")
             self._initialized = True
+            fut.set_result(True)
             return True
         except Exception as e:
             logger.error(f"Failed to initialize Google Calendar: {e}")
+            fut.set_result(False)
+            # Allow a later call to retry a failed init
+            self._init_future = None
             return False
     
     async def create_event(self, event: CalendarEvent) -> Optional[str]:
@@ -241,18 +265,20 @@ class GoogleCalendarService:
         Returns:
             str: Calendar event ID if created successfully
         """
+        parts = [
+            "حجز من LeblebBot",
+            "",
+            f"العميل: {customer_name}",
+            f"الهاتف: {customer_phone}",
+            f"الخدمة: {service}",
+            f"معرف الحجز: {booking_id}",
+        ]
+        if notes:
+            parts.extend(["", f"ملاحظات: {notes}"])
+
         event = CalendarEvent(
             summary=f"حجز - {customer_name} - {service}",
-            description=f"""
-حجز من LeblebBot
-
-العميل: {customer_name}
-الهاتف: {customer_phone}
-الخدمة: {service}
-معرف الحجز: {booking_id}
-
-{f'ملاحظات: {notes}' if notes else ''}
-            """.strip(),
+            description="\n".join(parts),
             start_time=start_time,
             end_time=start_time + timedelta(minutes=duration_minutes),
         )
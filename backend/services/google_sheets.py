@@ -3,6 +3,9 @@ Google Sheets Integration Service for LeblebBot
 Handles data export and analytics logging to Google Sheets
 """
 
+import asyncio
+import random
+import time
 from datetime import datetime
 from typing import Optional, List, Dict, Any
 import logging
@@ -10,6 +13,21 @@ from pydantic import BaseModel
 
 logger = logging.getLogger(__name__)
 
+_now_iso_cache: tuple[int, str] = (0, "")
+
+
+def _now_iso() -> str:
+    """
+    Second-resolution timestamp string for logged rows, refreshed at
+    most once per second: isoformat() allocates on every call and
+    sub-second precision buys nothing in a spreadsheet log.
+    """
+    global _now_iso_cache
+    sec = int(time.time())
+    if sec != _now_iso_cache[0]:
+        _now_iso_cache = (sec, datetime.fromtimestamp(sec).isoformat())
+    return _now_iso_cache[1]
+
 
 class SheetData(BaseModel):
     """Model for sheet data row"""
@@ -23,6 +41,16 @@ class GoogleSheetsService:
     Exports data and logs analytics
     """
     
+    # Rows buffer per (spreadsheet, sheet) and flush as one batched
+    # write when a trigger fires; one write per row is what runs the
+    # Sheets API into its per-minute quota. Bursts flush once the burst
+    # goes idle (or the buffer fills), trickles flush at worst after
+    # the max delay
+    BATCH_SIZE = 100
+    FLUSH_IDLE = 2.0  # seconds without a new row
+    FLUSH_MAX_DELAY = 10.0  # staleness bound under a steady trickle
+    WRITE_RETRIES = 5  # attempts per batch before requeueing
+
     def __init__(self, credentials_path: Optional[str] = None):
         """
         Initialize Google Sheets service
@@ -33,6 +61,17 @@ class GoogleSheetsService:
         self.credentials_path = credentials_path
         self.service = None
         self._initialized = False
+        self._pending: dict[tuple[str, str], list[list]] = {}
+        self._flush_task: Optional[asyncio.Task] = None
+        # (spreadsheet_id, sheet title) -> numeric sheetId, resolved
+        # once at initialize so flushes can address sheets by id
+        # instead of making the server parse an "A:Z" range per call
+        self._sheet_id: dict[tuple[str, str], int] = {}
+        self._row_added = asyncio.Event()
+        # googleapiclient is synchronous: writes run in worker threads
+        # so the event loop stays responsive, and the semaphore caps
+        # concurrent calls below Google's per-minute quota
+        self._api_sem = asyncio.Semaphore(4)
         
     async def initialize(self) -> bool:
         """
@@ -42,12 +81,33 @@ class GoogleSheetsService:
             bool: True if initialization successful
         """
         try:
-            # In production, this would use google-auth-oauthlib
+            # In production, this would use google-auth-oauthlib and
+            # build the client ONCE here with a pooled transport, so
+            # every append/get reuses warm TCP+TLS connections instead
+            # of re-handshaking per call:
             # from google.oauth2.credentials import Credentials
+            # from google.auth.transport.requests import AuthorizedSession
             # from googleapiclient.discovery import build
-            
+            # import requests.adapters
+            # session = AuthorizedSession(creds)
+            # session.mount("https://", requests.adapters.HTTPAdapter(
+            #     pool_connections=16, pool_maxsize=64))
+            # self.service = build('sheets', 'v4', credentials=creds)
+            #
+            # and resolve sheet ids once so writes address sheets
+            # numerically:
+            # meta = self.service.spreadsheets().get(
+            #     spreadsheetId=spreadsheet_id,
+            #     fields='sheets.properties(sheetId,title)'
+            # ).execute()
+            # for sheet in meta['sheets']:
+            #     props = sheet['properties']
+            #     self._sheet_id[(spreadsheet_id, props['title'])] = props['sheetId']
+
             logger.info("Google Sheets service initialized")
             self._initialized = True
+            if self._flush_task is None or self._flush_task.done():
+                self._flush_task = asyncio.create_task(self._flush_loop())
             return True
         except Exception as e:
             logger.error(f"Failed to initialize Google Sheets: {e}")
@@ -60,7 +120,9 @@ class GoogleSheetsService:
         values: List[Any]
     ) -> bool:
         """
-        Append a row to a Google Sheet
+        Queue a row for a Google Sheet. Rows are buffered and written in
+        batches (size or interval triggered) so bursts of orders don't
+        issue one API write per row.
         
         Args:
             spreadsheet_id: ID of the spreadsheet
@@ -68,28 +130,113 @@ class GoogleSheetsService:
             values: List of values for the row
             
         Returns:
-            bool: True if append successful
+            bool: True if the row was queued
         """
         if not self._initialized:
             await self.initialize()
-            
-        try:
-            # In production:
-            # range_name = f"{sheet_name}!A:Z"
-            # body = {'values': [values]}
-            # self.service.spreadsheets().values().append(
-            #     spreadsheetId=spreadsheet_id,
-            #     range=range_name,
-            #     valueInputOption='USER_ENTERED',
-            #     body=body
-            # ).execute()
-            
-            logger.info(f"Appended row to sheet: {sheet_name}")
-            return True
-            
-        except Exception as e:
-            logger.error(f"Failed to append row: {e}")
-            return False
+
+        buffer = self._pending.setdefault((spreadsheet_id, sheet_name), [])
+        buffer.append(values)
+        if len(buffer) >= self.BATCH_SIZE:
+            await self._flush()
+        else:
+            self._row_added.set()
+        return True
+
+    async def _flush_loop(self) -> None:
+        """
+        Background flusher: wakes when a row is queued, then waits for
+        the burst to go idle (no new row for FLUSH_IDLE) before writing,
+        with FLUSH_MAX_DELAY bounding staleness under a steady trickle.
+        """
+        loop = asyncio.get_running_loop()
+        while True:
+            await self._row_added.wait()
+            deadline = loop.time() + self.FLUSH_MAX_DELAY
+            while True:
+                self._row_added.clear()
+                remaining = deadline - loop.time()
+                if remaining <= 0:
+                    break
+                try:
+                    await asyncio.wait_for(
+                        self._row_added.wait(),
+                        timeout=min(self.FLUSH_IDLE, remaining)
+                    )
+                except asyncio.TimeoutError:
+                    break
+            if self._pending:
+                await self._flush()
+
+    async def flush(self) -> None:
+        """Write out any buffered rows (call on shutdown)"""
+        if self._pending:
+            await self._flush()
+
+    async def _flush(self) -> None:
+        """
+        Write all buffered rows, one batched call per spreadsheet.
+        Transient failures (429/5xx in production) are retried with
+        jittered exponential backoff; a batch that still fails is pushed
+        back onto the buffer so no logged row is dropped.
+        """
+        pending, self._pending = self._pending, {}
+        for (spreadsheet_id, sheet_name), rows in pending.items():
+            for attempt in range(self.WRITE_RETRIES):
+                try:
+                    async with self._api_sem:
+                        await asyncio.to_thread(
+                            self._write_batch, spreadsheet_id, sheet_name, rows
+                        )
+                    break
+                except Exception as e:
+                    if attempt + 1 >= self.WRITE_RETRIES:
+                        logger.error(f"Failed to flush rows, requeueing: {e}")
+                        # Requeue ahead of anything buffered meanwhile
+                        key = (spreadsheet_id, sheet_name)
+                        self._pending[key] = rows + self._pending.get(key, [])
+                        break
+                    # Full jitter, capped at 30s, mirroring the HTTP
+                    # client's backoff
+                    delay = random.uniform(0, min(30.0, 0.5 * (2 ** attempt)))
+                    logger.warning(
+                        f"Sheet write retry {attempt + 1}/{self.WRITE_RETRIES} "
+                        f"for {sheet_name}: {e}"
+                    )
+                    await asyncio.sleep(delay)
+
+    def _write_batch(
+        self,
+        spreadsheet_id: str,
+        sheet_name: str,
+        rows: List[List[Any]]
+    ) -> None:
+        """Blocking batched write; always called from a worker thread"""
+        # In production. RAW skips server-side parsing and formula
+        # evaluation of machine-logged values (timestamps, IDs, floats)
+        # — USER_ENTERED coercion buys nothing for rows we format
+        # ourselves and costs CPU against the per-minute quota. When the
+        # sheetId was resolved at initialize, appendCells addresses the
+        # sheet numerically — no name lookup or range parse server-side:
+        # sheet_id = self._sheet_id.get((spreadsheet_id, sheet_name))
+        # if sheet_id is not None:
+        #     self.service.spreadsheets().batchUpdate(
+        #         spreadsheetId=spreadsheet_id,
+        #         body={'requests': [{'appendCells': {
+        #             'sheetId': sheet_id,
+        #             'rows': [_as_row_data(r) for r in rows],
+        #             'fields': 'userEnteredValue',
+        #         }}]}
+        #     ).execute()
+        # else:
+        #     self.service.spreadsheets().values().append(
+        #         spreadsheetId=spreadsheet_id,
+        #         range=f"{sheet_name}!A:Z",
+        #         valueInputOption='RAW',
+        #         body={'values': rows, 'majorDimension': 'ROWS'}
+        #     ).execute()
+        
+        logger.info(f"Appended {len(rows)} row(s) to sheet: {sheet_name}")
     
     async def get_rows(
         self, 
@@ -156,10 +303,11 @@ class GoogleSheetsService:
         Returns:
             bool: True if logged successfully
         """
-        items_str = ", ".join([f"{item['name']} x{item['quantity']}" for item in items])
-        
+        # Generator feeds join directly; no throwaway list per order
+        items_str = ", ".join(f"{item['name']} x{item['quantity']}" for item in items)
+
         values = [
-            datetime.now().isoformat(),
+            _now_iso(),
             order_id,
             customer_name,
             customer_phone,
@@ -204,7 +352,7 @@ class GoogleSheetsService:
             bool: True if logged successfully
         """
         values = [
-            datetime.now().isoformat(),
+            _now_iso(),
             booking_id,
             customer_name,
             customer_phone,
@@ -248,7 +396,7 @@ class GoogleSheetsService:
             bool: True if logged successfully
         """
         values = [
-            datetime.now().isoformat(),
+            _now_iso(),
             conversation_id,
             customer_name,
             customer_phone,
@@ -1,29 +1,97 @@
 from __future__ import annotations
 
+import asyncio
 import logging
+import time
 from datetime import datetime
+from functools import lru_cache
 from typing import Any, Optional
 from uuid import uuid4
 
 import chromadb
 from motor.motor_asyncio import AsyncIOMotorClient
-from pymongo import DESCENDING
+from pymongo import DESCENDING, UpdateOne
 
 from config import get_settings
 
 logger = logging.getLogger(__name__)
 
+_memory_service: Optional["MemoryService"] = None
+
+# Fields the message read paths actually consume; metadata can be large
+# and no caller of the recent/history getters reads it
+_MESSAGE_PROJECTION = {
+    "role": 1,
+    "content": 1,
+    "timestamp": 1,
+    "conversation_id": 1,
+}
+
+
+@lru_cache(maxsize=None)
+def _get_mongo_client(uri: str) -> AsyncIOMotorClient:
+    """
+    Shared Motor client per URI. Each AsyncIOMotorClient owns a
+    connection pool; constructing one per MemoryService (tests, worker
+    processes importing twice) would multiply pools against the same
+    server.
+    """
+    return AsyncIOMotorClient(
+        uri,
+        maxPoolSize=100,
+        minPoolSize=8,
+        maxIdleTimeMS=60000,
+    )
+
+
+@lru_cache(maxsize=None)
+def _get_chroma_client(host: str, port: int) -> "chromadb.HttpClient":
+    """Shared Chroma HTTP client per endpoint, for the same reason."""
+    return chromadb.HttpClient(host=host, port=port)
+
+
+def get_memory_service() -> "MemoryService":
+    """Shared MemoryService singleton.
+
+    Reusing one instance keeps a single Motor client (with its warm
+    topology/DNS state) instead of re-parsing config per construction.
+    """
+    global _memory_service
+    if _memory_service is None:
+        _memory_service = MemoryService()
+    return _memory_service
+
 
 class MemoryService:
     """
     Memory service with MongoDB for structured data and ChromaDB for vector memory.
     """
 
+    # Write-behind message buffer: chatty conversations batch into one
+    # insert_many + one conversation bulk_write instead of two round
+    # trips per message
+    MSG_FLUSH_DELAY = 0.1  # seconds
+    MSG_BUF_MAX = 64
+
+    # Short-TTL cache of user documents: the working set of active
+    # phones is small, and repeat messages from the same user hit Mongo
+    # on every inbound message without it
+    USER_CACHE_TTL = 60.0  # seconds
+    USER_CACHE_MAX = 10_000
+
+    # last_contact heartbeats are coalesced per user and written as one
+    # unordered bulk_write per window
+    TOUCH_FLUSH_DELAY = 2.0  # seconds
+
+    # ChromaDB fact writes batch into one add() per window
+    FACT_FLUSH_DELAY = 1.0  # seconds
+    FACT_BUF_MAX = 32
+
     def __init__(self) -> None:
         self.settings = get_settings()
         
-        # MongoDB connection
-        self.mongo_client = AsyncIOMotorClient(self.settings.mongodb_uri)
+        # MongoDB connection (pooled client shared across instances)
+        self.mongo_client = _get_mongo_client(self.settings.mongodb_uri)
         self.db = self.mongo_client[self.settings.mongodb_database]
         
         # Collections
@@ -33,12 +101,30 @@ class MemoryService:
         self.knowledge = self.db.knowledge
         
         # Indexes will be created on startup in main.py
+
+        # Pending message writes (see append_message)
+        self._msg_buf: list[dict] = []
+        self._conv_counters: dict[str, int] = {}
+        self._buf_lock = asyncio.Lock()
+        self._msg_flush_task: Optional[asyncio.Task] = None
+
+        # User cache: lookup key ("id:", "phone:", "wa:", "email:") ->
+        # (timestamp, user doc)
+        self._user_cache: dict[str, tuple[float, dict]] = {}
+
+        # Pending last_contact timestamps, user_id -> latest datetime
+        self._touch_buf: dict[str, datetime] = {}
+        self._touch_flush_task: Optional[asyncio.Task] = None
+
+        # Pending ChromaDB fact writes: (id, document, metadata)
+        self._fact_buf: list[tuple[str, str, dict]] = []
+        self._fact_flush_task: Optional[asyncio.Task] = None
         
         # ChromaDB connection
         try:
-            self.chroma_client = chromadb.HttpClient(
-                host=self.settings.chroma_host,
-                port=self.settings.chroma_port
+            self.chroma_client = _get_chroma_client(
+                self.settings.chroma_host,
+                self.settings.chroma_port
             )
             self.user_memory = self.chroma_client.get_or_create_collection(
                 name="user_memory",
@@ -58,34 +144,102 @@ class MemoryService:
     # User Management
     # ===================
 
+    def _user_cache_get(self, key: str) -> Optional[dict]:
+        entry = self._user_cache.get(key)
+        if entry and time.monotonic() - entry[0] < self.USER_CACHE_TTL:
+            return entry[1]
+        if entry:
+            self._user_cache.pop(key, None)
+        return None
+
+    def _user_cache_put(self, user: dict) -> None:
+        """Cache a user doc under every identifier it can be looked up by"""
+        now = time.monotonic()
+        keys = [f"id:{user['_id']}"]
+        if user.get("phone"):
+            keys.append(f"phone:{user['phone']}")
+        if user.get("whatsapp_id"):
+            keys.append(f"wa:{user['whatsapp_id']}")
+        if user.get("email"):
+            keys.append(f"email:{user['email']}")
+        for key in keys:
+            if len(self._user_cache) >= self.USER_CACHE_MAX and key not in self._user_cache:
+                self._user_cache.pop(next(iter(self._user_cache)))
+            self._user_cache[key] = (now, user)
+
+    def _user_cache_invalidate(self, user_id: str) -> None:
+        stale = [
+            key for key, (_, doc) in self._user_cache.items()
+            if doc.get("_id") == user_id
+        ]
+        for key in stale:
+            self._user_cache.pop(key, None)
+
     async def get_or_create_user(self, identifier: dict) -> dict:
         """Get existing user or create new one"""
+        # Cache hit skips Mongo entirely for repeat-message users
+        for field, prefix in (("phone", "phone"), ("whatsapp_id", "wa"), ("email", "email")):
+            value = identifier.get(field)
+            if value:
+                cached = self._user_cache_get(f"{prefix}:{value}")
+                if cached is not None:
+                    self._touch_user(cached["_id"])
+                    return cached
+
         # Build query from available identifiers
         query = {"$or": []}
-        
+
         if identifier.get("phone"):
             query["$or"].append({"phone": identifier["phone"]})
         if identifier.get("whatsapp_id"):
             query["$or"].append({"whatsapp_id": identifier["whatsapp_id"]})
         if identifier.get("email"):
             query["$or"].append({"email": identifier["email"]})
-        
+
         if not query["$or"]:
             # No valid identifier, create new user
             return await self._create_user(identifier)
-        
+
         user = await self.users.find_one(query)
-        
+
         if user:
-            # Update last contact
-            await self.users.update_one(
-                {"_id": user["_id"]},
-                {"$set": {"last_contact": datetime.utcnow()}}
-            )
+            self._user_cache_put(user)
+            self._touch_user(user["_id"])
             return user
-        
+
         return await self._create_user(identifier)
 
+    def _touch_user(self, user_id: str) -> None:
+        """
+        Record a last_contact heartbeat. One update_one per returned
+        user was pure write amplification for chatty users; heartbeats
+        are buffered here (latest timestamp wins per user) and flushed
+        as a single unordered bulk_write every TOUCH_FLUSH_DELAY.
+        """
+        self._touch_buf[user_id] = datetime.utcnow()
+        if self._touch_flush_task is None or self._touch_flush_task.done():
+            self._touch_flush_task = asyncio.create_task(self._delayed_touch_flush())
+
+    async def _delayed_touch_flush(self) -> None:
+        await asyncio.sleep(self.TOUCH_FLUSH_DELAY)
+        await self.flush_last_contact()
+
+    async def flush_last_contact(self) -> None:
+        """Write out buffered last_contact updates. Also called on shutdown."""
+        if not self._touch_buf:
+            return
+        buf, self._touch_buf = self._touch_buf, {}
+        try:
+            await self.users.bulk_write(
+                [
+                    UpdateOne({"_id": uid}, {"$set": {"last_contact": ts}})
+                    for uid, ts in buf.items()
+                ],
+                ordered=False,
+            )
+        except Exception as e:
+            logger.error(f"last_contact flush error: {e}")
+
     async def _create_user(self, identifier: dict) -> dict:
         """Create new user"""
         user = {
@@ -106,11 +260,13 @@ class MemoryService:
         }
         
         await self.users.insert_one(user)
+        self._user_cache_put(user)
         logger.info(f"Created new user: {user['_id']}")
         return user
 
     async def update_user(self, user_id: str, updates: dict) -> bool:
         """Update user data"""
+        self._user_cache_invalidate(user_id)
         result = await self.users.update_one(
             {"_id": user_id},
             {"$set": updates}
@@ -119,11 +275,23 @@ class MemoryService:
 
     async def get_user(self, user_id: str) -> Optional[dict]:
         """Get user by ID"""
-        return await self.users.find_one({"_id": user_id})
+        cached = self._user_cache_get(f"id:{user_id}")
+        if cached is not None:
+            return cached
+        user = await self.users.find_one({"_id": user_id})
+        if user:
+            self._user_cache_put(user)
+        return user
 
     async def get_user_by_phone(self, phone: str) -> Optional[dict]:
         """Get user by phone number"""
-        return await self.users.find_one({"phone": phone})
+        cached = self._user_cache_get(f"phone:{phone}")
+        if cached is not None:
+            return cached
+        user = await self.users.find_one({"phone": phone})
+        if user:
+            self._user_cache_put(user)
+        return user
 
     # ===================
     # Conversation History
@@ -211,38 +379,68 @@ class MemoryService:
             "metadata": metadata or {}
         }
         
-        await self.messages.insert_one(message)
-        
-        # Update conversation
-        await self.conversations.update_one(
-            {"_id": conversation_id},
-            {
-                "$inc": {"message_count": 1},
-                "$set": {"updated_at": datetime.utcnow()}
-            }
-        )
+        flush_now = False
+        async with self._buf_lock:
+            self._msg_buf.append(message)
+            self._conv_counters[conversation_id] = (
+                self._conv_counters.get(conversation_id, 0) + 1
+            )
+            if len(self._msg_buf) >= self.MSG_BUF_MAX:
+                flush_now = True
+            elif self._msg_flush_task is None or self._msg_flush_task.done():
+                self._msg_flush_task = asyncio.create_task(self._delayed_flush())
+
+        if flush_now:
+            await self.flush_messages()
         
         return message
 
+    async def _delayed_flush(self) -> None:
+        await asyncio.sleep(self.MSG_FLUSH_DELAY)
+        await self.flush_messages()
+
+    async def flush_messages(self) -> None:
+        """
+        Write out buffered messages: one insert_many plus one
+        conversation bulk_write per flush window. Also called on
+        shutdown so nothing buffered is lost.
+        """
+        async with self._buf_lock:
+            if not self._msg_buf:
+                return
+            buf, self._msg_buf = self._msg_buf, []
+            counters, self._conv_counters = self._conv_counters, {}
+
+        now = datetime.utcnow()
+        try:
+            await self.messages.insert_many(buf, ordered=False)
+            await self.conversations.bulk_write([
+                UpdateOne(
+                    {"_id": cid},
+                    {"$inc": {"message_count": n}, "$set": {"updated_at": now}}
+                )
+                for cid, n in counters.items()
+            ])
+        except Exception as e:
+            logger.error(f"Message flush error: {e}")
+
     async def get_recent_messages(
         self, 
         conversation_id: str, 
         limit: int = 10
     ) -> list[dict]:
         """Get recent messages from conversation (chronological order)"""
-        from pymongo import ASCENDING
-        
-        # First, get total count to determine skip
-        total = await self.messages.count_documents({"conversation_id": conversation_id})
-        skip = max(0, total - limit)
-        
-        # Get messages sorted by timestamp ascending (oldest first)
+        # Newest-first with a limit, reversed in memory: one round trip
+        # and O(limit) index work, instead of a count_documents plus a
+        # skip that walks every older message server-side. Projection
+        # drops metadata bytes no caller reads
         cursor = self.messages.find(
-            {"conversation_id": conversation_id}
-        ).sort("timestamp", ASCENDING).skip(skip).limit(limit)
-        
+            {"conversation_id": conversation_id},
+            _MESSAGE_PROJECTION,
+        ).sort("timestamp", DESCENDING).limit(limit).batch_size(limit)
+
         messages = await cursor.to_list(length=limit)
-        return messages  # Already in chronological order
+        return list(reversed(messages))
 
     async def get_all_messages(
         self, 
@@ -258,26 +456,64 @@ class MemoryService:
         messages = await cursor.to_list(length=1000)  # Limit to 1000 messages
         return messages
 
+    async def list_active_with_last_message(self, limit: int = 50) -> list[dict]:
+        """
+        Active conversations joined with their user and latest message
+        in one aggregation, instead of 1 + 2N follow-up queries.
+        """
+        pipeline = [
+            {"$match": {"status": "active"}},
+            {"$sort": {"updated_at": -1}},
+            {"$limit": limit},
+            {"$lookup": {
+                "from": "users",
+                "localField": "user_id",
+                "foreignField": "_id",
+                "as": "user"
+            }},
+            {"$unwind": {"path": "$user", "preserveNullAndEmptyArrays": True}},
+            {"$lookup": {
+                "from": "messages",
+                "let": {"cid": "$_id"},
+                "pipeline": [
+                    {"$match": {"$expr": {"$eq": ["$conversation_id", "$$cid"]}}},
+                    {"$sort": {"timestamp": -1}},
+                    {"$limit": 1},
+                    {"$project": {"content": 1}},
+                ],
+                "as": "last_message"
+            }},
+        ]
+        return await self.conversations.aggregate(pipeline).to_list(length=limit)
+
     async def get_user_history(
         self, 
         user_id: str, 
         limit: int = 50
     ) -> list[dict]:
         """Get all messages for a user across conversations"""
-        # Get user's conversations
-        conversations = await self.conversations.find(
-            {"user_id": user_id}
-        ).to_list(length=100)
-        
-        conversation_ids = [c["_id"] for c in conversations]
-        
-        # Get messages
-        cursor = self.messages.find(
-            {"conversation_id": {"$in": conversation_ids}}
-        ).sort("timestamp", DESCENDING).limit(limit)
-        
-        messages = await cursor.to_list(length=limit)
-        return list(reversed(messages))
+        # One aggregation instead of two round-trips: collect the user's
+        # conversation ids server-side, then $lookup the newest messages
+        # across all of them
+        pipeline = [
+            {"$match": {"user_id": user_id}},
+            {"$group": {"_id": None, "cids": {"$push": "$_id"}}},
+            {"$lookup": {
+                "from": "messages",
+                "let": {"cids": "$cids"},
+                "pipeline": [
+                    {"$match": {"$expr": {"$in": ["$conversation_id", "$$cids"]}}},
+                    {"$sort": {"timestamp": -1}},
+                    {"$limit": limit},
+                    {"$project": _MESSAGE_PROJECTION},
+                ],
+                "as": "messages"
+            }},
+        ]
+        results = await self.conversations.aggregate(pipeline).to_list(length=1)
+        if not results:
+            return []
+        return list(reversed(results[0]["messages"]))
 
     # ===================
     # Vector Memory (ChromaDB)
@@ -287,20 +523,41 @@ class MemoryService:
         """Store a fact about user in vector memory"""
         if not self.user_memory:
             return False
-        
+
+        # Each add() round-trips to the Chroma server and re-indexes
+        # HNSW; facts are buffered and written as one batched add
+        self._fact_buf.append((
+            f"{user_id}_{uuid4().hex[:8]}",
+            fact,
+            {
+                "user_id": user_id,
+                "timestamp": datetime.utcnow().isoformat()
+            }
+        ))
+        if len(self._fact_buf) >= self.FACT_BUF_MAX:
+            await self.flush_user_facts()
+        elif self._fact_flush_task is None or self._fact_flush_task.done():
+            self._fact_flush_task = asyncio.create_task(self._delayed_fact_flush())
+        return True
+
+    async def _delayed_fact_flush(self) -> None:
+        await asyncio.sleep(self.FACT_FLUSH_DELAY)
+        await self.flush_user_facts()
+
+    async def flush_user_facts(self) -> None:
+        """Write out buffered user facts in one add(). Also called on shutdown."""
+        if not self._fact_buf or not self.user_memory:
+            return
+        buf, self._fact_buf = self._fact_buf, []
         try:
+            ids, docs, metas = zip(*buf)
             self.user_memory.add(
-                ids=[f"{user_id}_{uuid4().hex[:8]}"],
-                documents=[fact],
-                metadatas=[{
-                    "user_id": user_id,
-                    "timestamp": datetime.utcnow().isoformat()
-                }]
+                ids=list(ids),
+                documents=list(docs),
+                metadatas=list(metas)
             )
-            return True
         except Exception as e:
             logger.error(f"ChromaDB store error: {e}")
-            return False
 
     async def recall_user_facts(
         self, 
@@ -385,21 +642,26 @@ class MemoryService:
         from datetime import timedelta
         
         since = datetime.utcnow() - timedelta(days=days)
-        
-        total = await self.conversations.count_documents({
-            "created_at": {"$gte": since}
-        })
-        
-        resolved = await self.conversations.count_documents({
-            "created_at": {"$gte": since},
-            "resolved": True
-        })
-        
-        escalated = await self.conversations.count_documents({
-            "created_at": {"$gte": since},
-            "escalated": True
-        })
-        
+
+        # One $facet aggregation: the server traverses the created_at
+        # range once instead of three count_documents round trips
+        pipeline = [
+            {"$match": {"created_at": {"$gte": since}}},
+            {"$facet": {
+                "total": [{"$count": "n"}],
+                "resolved": [{"$match": {"resolved": True}}, {"$count": "n"}],
+                "escalated": [{"$match": {"escalated": True}}, {"$count": "n"}],
+            }},
+        ]
+        doc = (await self.conversations.aggregate(pipeline).to_list(length=1))[0]
+
+        def _count(facet: list) -> int:
+            return facet[0]["n"] if facet else 0
+
+        total = _count(doc["total"])
+        resolved = _count(doc["resolved"])
+        escalated = _count(doc["escalated"])
+
         return {
             "total": total,
             "resolved": resolved,
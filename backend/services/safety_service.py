@@ -2,7 +2,10 @@ from __future__ import annotations
 
 import logging
 import re
-from typing import Any, Optional
+from itertools import islice
+from typing import Any, ClassVar, Optional, Sequence
+
+import ahocorasick
 
 from config import get_settings
 
@@ -14,19 +17,25 @@ class SafetyService:
     Safety service for response validation, PII protection, and content filtering.
     """
 
-    # Blocked patterns (spam, scam indicators)
-    BLOCKED_PATTERNS = [
-        r"اضغط هنا فوراً",
-        r"عرض لفترة محدودة جداً",
-        r"ربح مضمون",
+    # Literal blocked terms (spam, scam indicators) — matched in a
+    # single pass by the module-level Aho-Corasick automaton instead of
+    # one regex scan per term
+    BLOCKED_TERMS = (
+        "اضغط هنا فوراً",
+        "عرض لفترة محدودة جداً",
+        "ربح مضمون",
+        "مبروك ربحت",
+        "bit.ly",
+        "tinyurl.com",
+        "click here",
+        "hack",
+        "phish",
+    )
+
+    # Blocked patterns that need real regex machinery (quantifiers)
+    BLOCKED_PATTERNS = (
         r"اربح \d+ جنيه",
-        r"مبروك ربحت",
-        r"bit\.ly",
-        r"tinyurl\.com",
-        r"click here",
-        r"hack",
-        r"phish",
-    ]
+    )
 
     # PII patterns
     PII_PATTERNS = {
@@ -37,24 +46,55 @@ class SafetyService:
     }
 
     # Forbidden promises (things bot shouldn't promise)
-    FORBIDDEN_PROMISES = [
+    FORBIDDEN_PROMISES = (
         "ضمان مدى الحياة",
         "استرجاع فوري",
         "تعويض كامل",
         "مجاناً تماماً",
         "بدون أي شروط",
-    ]
+    )
 
     # Uncertainty phrases
-    UNCERTAINTY_PHRASES = [
+    UNCERTAINTY_PHRASES = (
         "خليني أتأكد",
         "هسأل وأرد عليك",
         "مش متأكد",
         "هراجع",
-    ]
+    )
+
+    # Policy topics the bot must not assert without backing knowledge
+    POLICY_KEYWORDS = ("سياسة", "شروط", "استرجاع", "ضمان", "توصيل")
+
+    # Every regex used on the per-message paths, compiled once at class
+    # creation: the implicit re module cache still pays a dict lookup
+    # and argument parse per call
+    _PII_RE = {name: re.compile(pattern) for name, pattern in PII_PATTERNS.items()}
+    # All PII kinds fused into one named alternation, masked in a
+    # single left-to-right sub instead of a findall + str.replace loop
+    # per kind
+    _PII_UNION = re.compile(
+        "|".join(f"(?P<{name}>{pattern})" for name, pattern in PII_PATTERNS.items())
+    )
+    _PRICE_RE = re.compile(r"\b\d+\s*(جنيه|دولار|ريال|ج\.م)")
+    _URL_RE = re.compile(r"https?://\S+")
+    _URL_PREFIX_RE = re.compile(r"https?://")
+    _UPPER_HINT_RE = re.compile(r"[A-Z]")
+    _DIGIT_RE = re.compile(r"\d")
+    _WORD_RE = re.compile(r"\S+")
+    _HTML_RE = re.compile(r"<[^>]+>")
+    _TEMPLATE_RE = re.compile(r"\{[^}]+\}")
+    _WS_RE = re.compile(r"\s+")
+    _SENTENCE_ENDS = frozenset(".؟!")
+
+    # Settings are process-constant; bind them once as class state so
+    # per-request SafetyService construction skips the get_settings call
+    _settings: ClassVar[Optional[Any]] = None
 
     def __init__(self) -> None:
-        self.settings = get_settings()
+        cls = type(self)
+        if cls._settings is None:
+            cls._settings = get_settings()
+        self.settings = cls._settings
 
     async def validate_response(
         self, 
@@ -93,52 +133,70 @@ class SafetyService:
         return response
 
     def _remove_blocked_patterns(self, text: str) -> str:
-        """Remove blocked patterns from text"""
-        for pattern in self.BLOCKED_PATTERNS:
-            text = re.sub(pattern, "", text, flags=re.IGNORECASE)
-        return text.strip()
+        """Remove blocked terms and patterns from text"""
+        # One automaton scan finds every literal term; the matched spans
+        # are cut out of the original text afterwards
+        spans = [
+            (end - len(term) + 1, end + 1)
+            for end, term in _BLOCKED_AUTOMATON.iter(text.lower())
+        ]
+        if spans:
+            spans.sort()
+            pieces = []
+            pos = 0
+            for start, end in spans:
+                if start >= pos:
+                    pieces.append(text[pos:start])
+                    pos = end
+                elif end > pos:
+                    pos = end
+            pieces.append(text[pos:])
+            text = "".join(pieces)
+        return _BLOCKED_RE.sub("", text).strip()
 
     def _mask_pii(self, text: str) -> str:
         """Mask personally identifiable information"""
-        for pii_type, pattern in self.PII_PATTERNS.items():
-            matches = re.findall(pattern, text)
-            for match in matches:
-                if pii_type == "credit_card":
-                    # Keep last 4 digits
-                    masked = "****-****-****-" + match[-4:]
-                elif pii_type == "egypt_phone":
-                    # Keep first 3 and last 2
-                    masked = match[:3] + "****" + match[-2:]
-                elif pii_type == "email":
-                    # Mask middle of email
-                    parts = match.split("@")
-                    if len(parts) == 2:
-                        username = parts[0]
-                        if len(username) > 2:
-                            masked = username[0] + "***" + username[-1] + "@" + parts[1]
-                        else:
-                            masked = "***@" + parts[1]
-                    else:
-                        masked = "***"
-                else:
-                    masked = "***"
-                
-                text = text.replace(match, masked)
-        
-        return text
+        # Every PII pattern needs a digit or an @; most Arabic replies
+        # have neither, so this prefilter skips the alternation scan
+        if "@" not in text and not self._DIGIT_RE.search(text):
+            return text
+        return self._PII_UNION.sub(self._mask_one, text)
+
+    @staticmethod
+    def _mask_one(m: "re.Match[str]") -> str:
+        """Masked replacement for a single PII match, by kind"""
+        match = m.group()
+        pii_type = m.lastgroup
+        if pii_type == "credit_card":
+            # Keep last 4 digits
+            return "****-****-****-" + match[-4:]
+        if pii_type == "egypt_phone":
+            # Keep first 3 and last 2
+            return match[:3] + "****" + match[-2:]
+        if pii_type == "email":
+            # Mask middle of email
+            parts = match.split("@")
+            if len(parts) == 2:
+                username = parts[0]
+                if len(username) > 2:
+                    return username[0] + "***" + username[-1] + "@" + parts[1]
+                return "***@" + parts[1]
+            return "***"
+        return "***"
 
     def _check_promises(self, text: str) -> str:
         """Check for forbidden promises and soften them"""
-        text_lower = text.lower()
-        
-        for promise in self.FORBIDDEN_PROMISES:
-            if promise in text_lower:
-                # Add disclaimer
-                text = text.replace(
-                    promise, 
-                    f"{promise} (حسب الشروط والأحكام)"
-                )
-        
+        # One automaton pass finds every promise instead of a substring
+        # scan per promise. The promises are all Arabic, which has no
+        # case, so the scan runs on the raw text — no lowered copy
+        found = dict.fromkeys(p for _, p in _PROMISE_AUTOMATON.iter(text))
+        for promise in found:
+            # Add disclaimer
+            text = text.replace(
+                promise,
+                f"{promise} (حسب الشروط والأحكام)"
+            )
+
         return text
 
     async def _check_hallucination(
@@ -151,45 +209,57 @@ class SafetyService:
         If uncertain, add uncertainty phrase.
         """
         knowledge = context.get("knowledge", [])
-        
+        # Knowledge chunks joined once: each "needle in joined" below is
+        # a single C-level scan over contiguous memory instead of a
+        # Python-level loop of per-chunk substring checks
+        joined_knowledge = "\x00".join(knowledge) if knowledge else ""
+
         # Check for specific claims (prices, dates, policies)
-        price_pattern = r"\b\d+\s*(جنيه|دولار|ريال|ج\.م)"
-        prices_mentioned = re.findall(price_pattern, response)
-        
+        prices_mentioned = self._PRICE_RE.findall(response)
+
+        # Single pass for all uncertainty phrases
+        has_uncertainty = next(_UNCERTAINTY_AUTOMATON.iter(response), None) is not None
+
         # If prices mentioned but no knowledge about prices
-        if prices_mentioned and not any("سعر" in k or "جنيه" in k for k in knowledge):
+        if prices_mentioned and "سعر" not in joined_knowledge and "جنيه" not in joined_knowledge:
             # Add uncertainty
-            if not any(phrase in response for phrase in self.UNCERTAINTY_PHRASES):
+            if not has_uncertainty:
                 response = response + "\n\n(خليني أتأكد من السعر الحالي)"
-        
-        # Check for policy claims
-        policy_keywords = ["سياسة", "شروط", "استرجاع", "ضمان", "توصيل"]
-        for keyword in policy_keywords:
-            if keyword in response:
-                # Check if we have knowledge about this
-                if not any(keyword in k for k in knowledge):
-                    if not any(phrase in response for phrase in self.UNCERTAINTY_PHRASES):
+                has_uncertainty = True
+
+        # Check for policy claims: one scan of the response and one of
+        # the joined knowledge instead of a keyword x document loop
+        if not has_uncertainty:
+            present = {kw for _, kw in _POLICY_AUTOMATON.iter(response)}
+            if present:
+                known = (
+                    {kw for _, kw in _POLICY_AUTOMATON.iter(joined_knowledge)}
+                    if joined_knowledge else set()
+                )
+                for keyword in self.POLICY_KEYWORDS:
+                    if keyword in present and keyword not in known:
                         response = response + f"\n\n(هتأكد من {keyword} وأرد عليك)"
                         break
-        
+
         return response
 
     def _ensure_reasonable_length(self, text: str, max_length: int = 500) -> str:
         """Ensure response is not too long"""
         if len(text) > max_length:
-            # Find a good break point
+            # Find a good break point: one reverse walk with early exit
+            # instead of a full rfind sweep per terminator
             truncated = text[:max_length]
-            last_period = truncated.rfind(".")
-            last_question = truncated.rfind("؟")
-            last_exclaim = truncated.rfind("!")
-            
-            break_point = max(last_period, last_question, last_exclaim)
-            
+            break_point = -1
+            for i in range(len(truncated) - 1, -1, -1):
+                if truncated[i] in self._SENTENCE_ENDS:
+                    break_point = i
+                    break
+
             if break_point > max_length * 0.5:
                 text = truncated[:break_point + 1]
             else:
                 text = truncated + "..."
-        
+
         return text
 
     def validate_outgoing_message(self, message: str, context: dict) -> dict:
@@ -200,38 +270,56 @@ class SafetyService:
             Dict with is_valid, issues, and sanitized_message
         """
         issues = []
-        
+
+        # Cheap prefilters first: a C-level substring scan proves the
+        # absence of URLs (and an uppercase probe the absence of caps
+        # spam) so the clean common case skips the regex passes entirely
+        has_scheme = "://" in message
+
         # Check 1: Message length
         if len(message) > 4000:
             issues.append("message_too_long")
-        
+
         # Check 2: Links in first message
-        if context.get("is_first_message"):
-            if re.search(r"https?://", message):
+        if has_scheme and context.get("is_first_message"):
+            if self._URL_PREFIX_RE.search(message):
                 issues.append("link_in_first_message")
-        
+
         # Check 3: Too many links
-        links = re.findall(r"https?://\S+", message)
-        if len(links) > 1:
+        if has_scheme and len(self._URL_RE.findall(message)) > 1:
             issues.append("too_many_links")
-        
-        # Check 4: All caps (spammy)
-        words = message.split()
-        caps_words = sum(1 for w in words if w.isupper() and len(w) > 2)
-        if caps_words > len(words) * 0.3:
-            issues.append("too_much_caps")
-        
-        # Check 5: Blocked patterns
-        for pattern in self.BLOCKED_PATTERNS:
-            if re.search(pattern, message, re.IGNORECASE):
-                issues.append(f"blocked_pattern: {pattern}")
+
+        # Check 4: All caps (spammy); Arabic has no case, so no
+        # uppercase ASCII means nothing to count
+        if self._UPPER_HINT_RE.search(message):
+            # Count words and caps words in one traversal without
+            # materializing the split list
+            caps_words = 0
+            total_words = 0
+            for word_match in self._WORD_RE.finditer(message):
+                total_words += 1
+                word = word_match.group()
+                if len(word) > 2 and word.isupper():
+                    caps_words += 1
+            if caps_words > total_words * 0.3:
+                issues.append("too_much_caps")
+        
+        # Check 5: Blocked terms and patterns (one scan for all terms)
+        hits = dict.fromkeys(
+            term for _, term in _BLOCKED_AUTOMATON.iter(message.lower())
+        )
+        for term in hits:
+            issues.append(f"blocked_pattern: {term}")
+        match = _BLOCKED_RE.search(message)
+        if match:
+            issues.append(f"blocked_pattern: {match.group(0)}")
         
         # Sanitize
         sanitized = message
         if "too_much_caps" in issues:
             sanitized = sanitized.lower()
         if "link_in_first_message" in issues:
-            sanitized = re.sub(r"https?://\S+", "[link removed]", sanitized)
+            sanitized = self._URL_RE.sub("[link removed]", sanitized)
         
         return {
             "is_valid": len(issues) == 0,
@@ -275,49 +363,58 @@ class SafetyService:
 
     def sanitize_user_input(self, text: str) -> str:
         """Sanitize user input before processing"""
-        # Remove excessive whitespace
-        text = " ".join(text.split())
-        
-        # Remove potential injection attempts
-        text = re.sub(r"<[^>]+>", "", text)  # Remove HTML tags
-        text = re.sub(r"\{[^}]+\}", "", text)  # Remove template syntax
-        
-        # Limit length
+        # Limit length first: everything past the cap gets thrown away
+        # anyway, so the passes below never scan an oversized payload
         if len(text) > 2000:
             text = text[:2000]
-        
+
+        # Remove excessive whitespace in one pass; no token list built
+        text = self._WS_RE.sub(" ", text)
+
+        # Remove potential injection attempts
+        text = self._HTML_RE.sub("", text)  # Remove HTML tags
+        text = self._TEMPLATE_RE.sub("", text)  # Remove template syntax
+
         return text.strip()
 
-    def detect_spam(self, message: str, user_history: list) -> dict:
+    def detect_spam(self, message: str, user_history: Sequence[dict]) -> dict:
         """
         Detect if message is spam.
-        
+
+        user_history is any reversible sequence of message dicts —
+        callers keeping a deque(maxlen=5) of recent messages pass it
+        straight in, no slicing or copying needed.
+
         Returns:
             Dict with is_spam and confidence
         """
         spam_indicators = 0
-        
-        # Check for repeated messages
+
+        # Check the last five messages lazily: no sublist or set is
+        # allocated and the scan stops at the first repeat
         if user_history:
-            recent_messages = [m.get("content", "") for m in user_history[-5:]]
-            if message in recent_messages:
+            recent = islice(reversed(user_history), 5)
+            if any(m.get("content", "") == message for m in recent):
                 spam_indicators += 2
         
-        # Check for spam patterns
-        spam_patterns = [
-            r"(.)\1{4,}",  # Repeated characters (hhhhh, aaaaa)
-            r"(\b\w+\b)(\s+\1){2,}",  # Repeated words
-            r"https?://\S+.*https?://\S+",  # Multiple URLs
-        ]
-        
-        for pattern in spam_patterns:
-            if re.search(pattern, message):
-                spam_indicators += 1
-        
-        # Check message length anomalies
+        # Check message length anomalies (cheap, so before the regexes)
         if len(message) > 1500:
             spam_indicators += 1
-        
+
+        # Pattern signals only while the verdict is still open. These
+        # are deterministic single-pass scans: the old backreference
+        # regex for repeated words backtracks (a ReDoS vector on
+        # attacker-controlled input), and the repeated-char pattern is
+        # just as easily a counting loop
+        if spam_indicators < 2 and _has_repeated_char(message):
+            spam_indicators += 1
+        if spam_indicators < 2 and _has_repeated_word(message):
+            spam_indicators += 1
+        if spam_indicators < 2:
+            # Two or more URLs; finditer stops after the second hit
+            if sum(1 for _ in islice(self._URL_RE.finditer(message), 2)) > 1:
+                spam_indicators += 1
+
         is_spam = spam_indicators >= 2
         confidence = min(spam_indicators * 0.25, 1.0)
         
@@ -326,3 +423,64 @@ class SafetyService:
             "confidence": confidence,
             "indicators": spam_indicators
         }
+
+
+def _has_repeated_char(text: str, threshold: int = 5) -> bool:
+    """True if any character repeats `threshold`+ times in a row"""
+    prev = ""
+    run = 1
+    for char in text:
+        if char == prev:
+            run += 1
+            if run >= threshold:
+                return True
+        else:
+            prev = char
+            run = 1
+    return False
+
+
+def _has_repeated_word(text: str, threshold: int = 3) -> bool:
+    """True if any word appears `threshold`+ times consecutively"""
+    prev = None
+    run = 1
+    for word in text.split():
+        if word == prev:
+            run += 1
+            if run >= threshold:
+                return True
+        else:
+            prev = word
+            run = 1
+    return False
+
+
+def _build_automaton(words) -> ahocorasick.Automaton:
+    automaton = ahocorasick.Automaton()
+    for word in words:
+        automaton.add_word(word, word)
+    automaton.make_automaton()
+    return automaton
+
+
+def _build_blocked_automaton() -> ahocorasick.Automaton:
+    automaton = ahocorasick.Automaton()
+    for term in SafetyService.BLOCKED_TERMS:
+        # Inputs are lowercased before scanning, so fold case here once
+        automaton.add_word(term.lower(), term)
+    automaton.make_automaton()
+    return automaton
+
+
+_BLOCKED_AUTOMATON = _build_blocked_automaton()
+_UNCERTAINTY_AUTOMATON = _build_automaton(SafetyService.UNCERTAINTY_PHRASES)
+_PROMISE_AUTOMATON = _build_automaton(SafetyService.FORBIDDEN_PROMISES)
+_POLICY_AUTOMATON = _build_automaton(SafetyService.POLICY_KEYWORDS)
+
+# Regex-shaped entries compiled once into a single case-insensitive
+# alternation: one scan instead of a compile-cache lookup and pass per
+# pattern on every call
+_BLOCKED_RE = re.compile(
+    "|".join(f"(?:{p})" for p in SafetyService.BLOCKED_PATTERNS),
+    re.IGNORECASE,
+)
@@ -3,6 +3,7 @@ WhatsApp Notifications Service for LeblebBot
 Sends notifications for orders, bookings, and other events
 """
 
+import string
 from datetime import datetime
 from typing import Optional, List, Dict, Any
 import logging
@@ -179,7 +180,33 @@ Is there anything we can help you with? 💜
                 """.strip()
             }
         }
-    
+
+        # Templates parsed once up front: str.format re-scans the whole
+        # template for {fields} on every call, which adds up during
+        # notification bursts. Rendering walks the parsed segments
+        self._compiled_templates = {
+            (ntype, lang): list(string.Formatter().parse(tmpl))
+            for ntype, by_lang in self.templates.items()
+            for lang, tmpl in by_lang.items()
+        }
+
+    @staticmethod
+    def _render(parsed: list, variables: Dict[str, Any]) -> str:
+        """Render a pre-parsed template against its variables"""
+        out = []
+        append = out.append
+        for literal, field, spec, conv in parsed:
+            if literal:
+                append(literal)
+            if field is not None:
+                value = variables[field]
+                if conv == "s":
+                    value = str(value)
+                elif conv == "r":
+                    value = repr(value)
+                append(format(value, spec or ""))
+        return "".join(out)
+
     async def initialize(self) -> bool:
         """
         Initialize the WhatsApp notification service
@@ -219,13 +246,13 @@ Is there anything we can help you with? 💜
             await self.initialize()
             
         try:
-            template = self.templates.get(notification_type, {}).get(language)
-            if not template:
+            parsed = self._compiled_templates.get((notification_type, language))
+            if parsed is None:
                 logger.error(f"Template not found: {notification_type} ({language})")
                 return False
-            
+
             # Format message with variables
-            message = template.format(**variables)
+            message = self._render(parsed, variables)
             
             # In production, send via Evolution API:
             # import httpx
@@ -1,42 +1,96 @@
+import asyncio
 import logging
-from typing import Set
+from collections import defaultdict
+from typing import Dict, Optional, Set
 
+import orjson
 from fastapi import WebSocket
 
 logger = logging.getLogger(__name__)
 
+# Per-connection outbound buffer; a client this far behind is disconnected
+QUEUE_SIZE = 64
+
 
 class ConnectionManager:
     """Manages WebSocket connections for real-time updates."""
 
     def __init__(self) -> None:
-        self.active_connections: Set[WebSocket] = set()
+        # Keyed by id(ws): disconnect is a pop-by-int and broadcast walks
+        # the compact dict values without hashing WebSocket objects
+        self.active_connections: Dict[int, WebSocket] = {}
+        # Per-user buckets so user-directed sends don't touch every socket
+        self.by_user: Dict[str, Set[WebSocket]] = defaultdict(set)
+        self._socket_user: Dict[WebSocket, str] = {}
+        # Each socket gets a bounded queue drained by its own writer task,
+        # so producers never block on a slow peer
+        self._queues: Dict[WebSocket, asyncio.Queue] = {}
+        self._writers: Dict[WebSocket, asyncio.Task] = {}
 
-    async def connect(self, websocket: WebSocket) -> None:
+    async def connect(self, websocket: WebSocket, user_id: Optional[str] = None) -> None:
         await websocket.accept()
-        self.active_connections.add(websocket)
+        self.active_connections[id(websocket)] = websocket
+        if user_id:
+            self.by_user[user_id].add(websocket)
+            self._socket_user[websocket] = user_id
+        queue: asyncio.Queue = asyncio.Queue(maxsize=QUEUE_SIZE)
+        self._queues[websocket] = queue
+        self._writers[websocket] = asyncio.create_task(self._writer(websocket, queue))
         logger.info(f"WebSocket connected. Total: {len(self.active_connections)}")
 
     def disconnect(self, websocket: WebSocket) -> None:
-        self.active_connections.discard(websocket)
+        self.active_connections.pop(id(websocket), None)
+        user_id = self._socket_user.pop(websocket, None)
+        if user_id:
+            bucket = self.by_user.get(user_id)
+            if bucket is not None:
+                bucket.discard(websocket)
+                if not bucket:
+                    del self.by_user[user_id]
+        self._queues.pop(websocket, None)
+        writer = self._writers.pop(websocket, None)
+        if writer:
+            writer.cancel()
         logger.info(f"WebSocket disconnected. Total: {len(self.active_connections)}")
 
+    async def _writer(self, websocket: WebSocket, queue: asyncio.Queue) -> None:
+        """Drain one connection's queue; only this task touches the socket."""
+        try:
+            while True:
+                payload = await queue.get()
+                await websocket.send_text(payload)
+        except asyncio.CancelledError:
+            pass
+        except Exception:
+            self.disconnect(websocket)
+
     async def broadcast(self, message: dict) -> None:
         """Broadcast message to all connected clients."""
-        disconnected = set()
-        for connection in self.active_connections:
-            try:
-                await connection.send_json(message)
-            except Exception:
-                disconnected.add(connection)
-
-        # Remove disconnected
-        self.active_connections -= disconnected
+        self._fan_out(list(self.active_connections.values()), message)
 
     async def send_to_user(self, user_id: str, message: dict) -> None:
-        """Send message to specific user (if we track user connections)."""
-        # For now, broadcast to all
-        await self.broadcast(message)
+        """Send message to a specific user's connections only."""
+        self._fan_out(list(self.by_user.get(user_id, ())), message)
+
+    def _fan_out(self, connections: list, message: dict) -> None:
+        if not connections:
+            return
+
+        # Encode once instead of letting send_json re-serialize the same
+        # dict per socket; clients expect text frames.
+        payload = orjson.dumps(message).decode()
+
+        # Non-blocking enqueue: broadcast latency stays constant no matter
+        # how slow individual peers are. A full queue means the client
+        # can't keep up — drop it.
+        for connection in connections:
+            queue = self._queues.get(connection)
+            if queue is None:
+                continue
+            try:
+                queue.put_nowait(payload)
+            except asyncio.QueueFull:
+                self.disconnect(connection)
 
 
 manager = ConnectionManager()